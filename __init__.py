@@ -20,35 +20,1141 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
+import os
+import re
 import sys
 import subprocess
 import json
 import time
+import socket
+import signal
+import ssl
+import hashlib
+from threading import Thread, Condition, Lock, Timer
 from os import makedirs, remove, listdir, path
 from os.path import dirname, join, exists, expanduser, isfile, abspath, isdir
+from glob import glob
 import shutil
+from collections import OrderedDict
 from adapt.intent import IntentBuilder
 from mycroft.skills.core import MycroftSkill, intent_handler
 from mycroft.util.log import LOG
-from fuzzywuzzy import fuzz, process as fuzz_process
+from fuzzywuzzy import fuzz
+from fuzzywuzzy.utils import full_process
+try:
+    from rapidfuzz import fuzz as rapidfuzz_fuzz
+    from rapidfuzz import process as rapidfuzz_process
+except ImportError:
+    rapidfuzz_fuzz = rapidfuzz_process = None
 
 from mycroft.audio import wait_while_speaking
 from mycroft.messagebus.message import Message
-import mycroft.client.enclosure.display_manager as DisplayManager
+try:
+    from mycroft.identity import IdentityManager
+except ImportError:
+    IdentityManager = None
+
+
+class PianobarTimeout(Exception):
+    """ pianobar didn't show the expected output in time """
+    pass
+
+
+class PianobarExited(Exception):
+    """ pianobar isn't running, so it can't be sent anything """
+    pass
+
+
+def fetch_tls_fingerprint(host="tuner.pandora.com", port=443, timeout=10):
+    """ Get the SHA1 fingerprint of a server's certificate.
+
+        This is what pianobar expects for tls_fingerprint, the same value
+        `openssl x509 -noout -fingerprint` prints but without the colons.
+
+        Returns:
+            str: upper case hex digest
+    """
+    context = ssl.create_default_context()
+    context.check_hostname = False
+    context.verify_mode = ssl.CERT_NONE
+    conn = socket.create_connection((host, port), timeout)
+    try:
+        with context.wrap_socket(conn, server_hostname=host) as tls:
+            der = tls.getpeercert(binary_form=True)
+    finally:
+        conn.close()
+    return hashlib.sha1(der).hexdigest().upper()
+
+
+class Histogram(object):
+    """ Counts of observed values in fixed, cumulative buckets """
+    __slots__ = ("bounds", "counts", "count", "sum")
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * len(bounds)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.bounds):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def as_dict(self):
+        return {"count": self.count, "sum": self.sum,
+                "buckets": dict(zip([str(b) for b in self.bounds],
+                                    self.counts))}
+
+
+class _NullTimer(object):
+    """ Stands in for Metrics.timer() while metrics are off """
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+class _Timer(object):
+    __slots__ = ("metrics", "name", "started")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.started = time.time()
+        return self
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.time() - self.started)
+        return False
+
+
+class Metrics(object):
+    """ Latency histograms and counters for the skill's hot paths.
+
+        Everything is a no-op until enabled is set, so the instrumented
+        code only pays for an attribute check when nobody is looking.
+    """
+    BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0,
+               10.0, 30.0)
+    _NULL_TIMER = _NullTimer()
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.histograms = {}
+        self.counters = {}
+        self._lock = Lock()
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self.histograms.get(name)
+            if histogram is None:
+                histogram = self.histograms[name] = Histogram(self.BUCKETS)
+            histogram.observe(seconds)
+
+    def timer(self, name):
+        """ Context manager recording how long its body took as name """
+        if not self.enabled:
+            return self._NULL_TIMER
+        return _Timer(self, name)
+
+    def set_counter(self, name, value):
+        """ Record a total that is kept somewhere else """
+        if not self.enabled:
+            return
+        with self._lock:
+            self.counters[name] = value
+
+    def snapshot(self):
+        with self._lock:
+            return {"counters": dict(self.counters),
+                    "histograms": dict((name, h.as_dict()) for name, h
+                                       in self.histograms.items())}
+
+    def prometheus_text(self):
+        """ The metrics in Prometheus' text exposition format """
+        lines = []
+        with self._lock:
+            for name, value in sorted(self.counters.items()):
+                lines.append("# TYPE pianobar_{0} counter".format(name))
+                lines.append("pianobar_{0} {1}".format(name, value))
+            for name, h in sorted(self.histograms.items()):
+                name = "pianobar_" + name + "_seconds"
+                lines.append("# TYPE {0} histogram".format(name))
+                for bound, count in zip(h.bounds, h.counts):
+                    lines.append('{0}_bucket{{le="{1}"}} {2}'.format(
+                        name, bound, count))
+                lines.append('{0}_bucket{{le="+Inf"}} {1}'.format(
+                    name, h.count))
+                lines.append("{0}_sum {1}".format(name, h.sum))
+                lines.append("{0}_count {1}".format(name, h.count))
+        return "\n".join(lines) + "\n"
+
+    def write_textfile(self, file_path):
+        """ Atomically write prometheus_text() for node_exporter """
+        tmp_path = file_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, file_path)
+
+
+class PianobarOutputParser(object):
+    """ Turns pianobar's screen output into events, one line at a time.
+
+        Text is fed in as it is read and split on newlines and the carriage
+        returns the time ticker redraws itself with.  Each line that means
+        something is passed to the callbacks subscribed to its kind:
+
+            position    (elapsed, total) seconds, about once a second
+            song        (title, artist, album, station)
+            station     (name,) when a station is tuned in
+            station_list  (index, name) for each line of the station list
+            error       (message,) for pianobar's "/!\\" lines
+
+        Only a partial line is held between feeds, and the latest position
+        and error are kept so they can be read without waiting for one.
+    """
+    MAX_LINE = 1024
+    ESCAPE = re.compile(r"\x1b\[[0-9;]*[A-Za-z]")
+    LINES = [
+        ("position", re.compile(r"^#\s+(-?)(\d+):(\d+)/(\d+):(\d+)")),
+        ("station", re.compile(r'^\|>\s+Station "(.*)" \(\d+\)')),
+        ("song", re.compile(r'^\|>\s+"(.*)" by "(.*)" on "(.*)"'
+                            r'(?:.*? @ (.*))?$')),
+        ("station_list", re.compile(r"^\s*(\d+)\) ... (.+)$")),
+        ("error", re.compile(r"^/!\\\s+(.*)$")),
+    ]
+
+    def __init__(self):
+        self.position = None  # (elapsed, total) seconds
+        self.last_error = None
+        self._partial = ""
+        self._subscribers = {}
+
+    def reset(self):
+        """ Forget what was seen, for a new process """
+        self.position = None
+        self.last_error = None
+        self._partial = ""
+
+    def subscribe(self, kind, callback):
+        self._subscribers.setdefault(kind, []).append(callback)
+
+    def feed(self, text):
+        lines = re.split(r"[\r\n]", self._partial + text)
+        self._partial = lines.pop()[-self.MAX_LINE:]
+        for line in lines:
+            if line:
+                self._parse(self.ESCAPE.sub("", line).strip())
+
+    def _parse(self, line):
+        for kind, pattern in self.LINES:
+            match = pattern.match(line)
+            if match:
+                break
+        else:
+            return
+        if kind == "position":
+            sign, minutes, seconds, total_m, total_s = match.groups()
+            total = int(total_m) * 60 + int(total_s)
+            shown = int(minutes) * 60 + int(seconds)
+            # pianobar counts down unless told otherwise
+            args = (total - shown if sign else shown, total)
+            self.position = args
+        elif kind == "station_list":
+            args = (int(match.group(1)), match.group(2))
+        else:
+            args = match.groups()
+            if kind == "error":
+                self.last_error = args[0]
+        for callback in self._subscribers.get(kind, ()):
+            try:
+                callback(*args)
+            except Exception:
+                LOG.exception("pianobar output subscriber failed")
+
+
+class PianobarProcess(object):
+    """ Owns a single, long-lived pianobar child process.
+
+        The Pandora login only happens when the process is started.  After
+        that stations are switched in place using pianobar's 's' command,
+        and the process is only restarted if it has died on its own.
+
+        pianobar's stdout is drained by a reader thread so commands can wait
+        for the prompt they need (e.g. "Select station:") instead of
+        sleeping for a fixed amount of time.
+
+        Writes are serialized, and keys that belong together are sent in
+        one write with the caller waiting for pianobar to show the result,
+        so one command has taken effect before the next is typed.
+
+        The reader thread also sees the pipe close when the child exits.
+        If that wasn't asked for with stop(), on_exit is called with this
+        object, the exit code and a guess at why from the last output.
+
+        Everything read is also given to a PianobarOutputParser, see
+        subscribe().
+    """
+    STATION_PROMPT = re.compile(r"Select station:")
+    PLAYING = re.compile(r"#\s+-?\d+:\d+/\d+:\d+")
+    STATION_CHANGED = re.compile(r'\|>\s+Station "')
+    TLS_ERROR = re.compile(r"TLS fingerprint mismatch|TLS handshake failed")
+    # Checked in order against the last few lines when pianobar dies.
+    # A failed login can be a network problem too ("Login... Error:
+    # Network error."), so only a rejected password counts as "login".
+    EXIT_REASONS = [
+        ("tls", TLS_ERROR),
+        ("network", re.compile(r"Network error|Connection|resolve|"
+                               r"Timeout", re.I)),
+        ("login", re.compile(r"Invalid (username|password)|"
+                             r"Wrong email address or password", re.I)),
+        ("access_denied", re.compile(r"Access denied", re.I)),
+        ("skip_limit", re.compile(r"skip limit", re.I)),
+    ]
+    EXIT_LINES = 5
+
+    def __init__(self, timeout=15, executable="pianobar", name="main",
+                 config_home=None, session=""):
+        self.process = None
+        self.executable = executable
+        self.name = name  # tells this instance's events apart
+        # pianobar reads $XDG_CONFIG_HOME/pianobar, one per session
+        self.config_home = config_home or expanduser("~/.config")
+        self.session = session
+        self.debug_mode = False
+        self.restarts = 0
+        self.timeout = timeout
+        self.on_exit = None
+        self.started_at = None
+        self.station = None  # index of the station tuned in
+        self.parser = PianobarOutputParser()
+        self._expected_exit = None  # process that stop() is ending
+        self._output = ""
+        self._output_changed = Condition()
+        self._write_lock = Lock()
+
+    @property
+    def running(self):
+        return self.process is not None and self.process.poll() is None
+
+    @property
+    def position(self):
+        """ (elapsed, total) seconds of the current song, or None """
+        return self.parser.position
+
+    def subscribe(self, kind, callback):
+        """ Call callback on the reader thread for each kind of output line
+
+            Callbacks must be quick, pianobar blocks when its output isn't
+            read.  See PianobarOutputParser for the kinds and arguments.
+        """
+        self.parser.subscribe(kind, callback)
+
+    @property
+    def pid_path(self):
+        return join(self.config_home, 'pianobar', self.name + '.pid')
+
+    @staticmethod
+    def kill_orphans(config_home, executable="pianobar"):
+        """ Kill pianobars left running by an earlier run of this session.
+
+            Only processes recorded in the session's pid files are touched,
+            and only if they are still running the pianobar executable, so
+            other sessions and users on the host are left alone.
+        """
+        name = os.path.basename(executable)
+        for pid_path in glob(join(config_home, 'pianobar', '*.pid')):
+            try:
+                with open(pid_path, 'r') as f:
+                    pid = int(f.read().strip())
+                with open('/proc/{}/cmdline'.format(pid), 'rb') as f:
+                    cmdline = f.read().split(b'\0')[0].decode()
+                if os.path.basename(cmdline) == name:
+                    os.kill(pid, signal.SIGKILL)
+            except (IOError, OSError, ValueError):
+                pass  # already gone, or not ours to kill
+            try:
+                remove(pid_path)
+            except OSError:
+                pass
+
+    def start(self):
+        """ Start pianobar if it isn't already running.
+
+            Returns:
+                bool: True if a new process was spawned
+        """
+        if self.running:
+            return False
+        if self.process is not None:
+            # The previous child exited without being asked to
+            self.restarts += 1
+            LOG.warning("pianobar exited with code " +
+                        str(self.process.returncode) + ", restarting")
+        with self._output_changed:
+            self._output = ""
+        self.parser.reset()
+        self.started_at = time.time()
+        self.station = None
+        env = dict(os.environ, PIANOBAR_INSTANCE=self.name,
+                   PIANOBAR_SESSION=self.session,
+                   XDG_CONFIG_HOME=self.config_home)
+        self.process = subprocess.Popen([self.executable],
+                                        stdin=subprocess.PIPE,
+                                        stdout=subprocess.PIPE,
+                                        env=env)
+        try:
+            with open(self.pid_path, 'w') as f:
+                f.write(str(self.process.pid))
+        except (IOError, OSError):
+            LOG.warning("Couldn't write " + self.pid_path)
+        reader = Thread(target=self._read_output, args=(self.process,),
+                        name="PianobarOutput")
+        reader.daemon = True
+        reader.start()
+        return True
+
+    def _read_output(self, process):
+        fd = process.stdout.fileno()
+        while True:
+            try:
+                data = os.read(fd, 4096)
+            except OSError:
+                data = b""
+            if not data:
+                break
+            text = data.decode("utf-8", "replace")
+            if self.debug_mode:
+                LOG.info("pianobar: " + text.strip())
+            with self._output_changed:
+                # Only the recent tail is needed to spot prompts
+                self._output = (self._output + text)[-8192:]
+                self._output_changed.notify_all()
+            self.parser.feed(text)
+        with self._output_changed:
+            self._output_changed.notify_all()
+
+        code = process.wait()
+        if self.on_exit and process is not self._expected_exit:
+            self.on_exit(self, code, self.exit_reason())
+
+    def exit_reason(self):
+        """ Best guess at why pianobar quit, from its last output """
+        with self._output_changed:
+            output = self._output
+        lines = [line for line in re.split(r"[\r\n]", output) if line.strip()]
+        output = "\n".join(lines[-self.EXIT_LINES:])
+        for reason, pattern in self.EXIT_REASONS:
+            if pattern.search(output):
+                return reason
+        return "unknown"
+
+    def wait_for(self, pattern, timeout=None):
+        """ Block until pianobar prints something matching pattern.
+
+            Output up to and including the match is consumed, so the same
+            prompt isn't matched twice.
+
+            Args:
+                pattern (re): compiled regular expression to look for
+                timeout (float): seconds to wait, defaults to self.timeout
+            Raises:
+                PianobarTimeout: pianobar exited or the timeout expired
+        """
+        timeout = self.timeout if timeout is None else timeout
+        deadline = time.time() + timeout
+        with self._output_changed:
+            while True:
+                match = pattern.search(self._output)
+                if match:
+                    self._output = self._output[match.end():]
+                    return
+                remaining = deadline - time.time()
+                if remaining <= 0 or not self.running:
+                    raise PianobarTimeout("Timed out waiting for " +
+                                          pattern.pattern)
+                self._output_changed.wait(min(remaining, 0.5))
+
+    def saw(self, pattern):
+        """ Check output that hasn't been consumed yet for pattern """
+        with self._output_changed:
+            return pattern.search(self._output) is not None
+
+    def send(self, s):
+        """ Write keys to pianobar in a single write.
+
+            Raises:
+                PianobarExited: the process is gone or its pipe is closed
+        """
+        with self._write_lock:
+            if not self.running:
+                raise PianobarExited("pianobar is not running")
+            try:
+                self.process.stdin.write(s.encode())
+                self.process.stdin.flush()
+            except (IOError, OSError, ValueError) as e:
+                raise PianobarExited("pianobar stopped reading: " + str(e))
+
+    def command(self, s, expect=None, timeout=None):
+        """ Send keys to pianobar, optionally waiting for a response. """
+        if expect:
+            with self._output_changed:
+                self._output = ""
+        self.send(s)
+        if expect:
+            self.wait_for(expect, timeout)
+
+    def select_first_station(self, index=0):
+        """ Answer the station prompt pianobar shows after logging in """
+        self.wait_for(self.STATION_PROMPT)
+        self.send(str(index) + "\n")
+        self.station = index
+
+    def change_station(self, index):
+        if index == self.station:
+            # pianobar only announces a station that differs from the
+            # current one, there would be nothing to wait for
+            return
+        # pianobar reads the number from its input buffer once it has
+        # shown the station prompt, so both parts can go in one write
+        self.command("s" + str(index) + "\n", expect=self.STATION_CHANGED)
+        self.station = index
+
+    def stop(self, timeout=2):
+        self._expected_exit = self.process
+        if self.running:
+            try:
+                self.send("q")
+                self.process.wait(timeout)
+            except Exception:
+                self.process.kill()
+        if self.process is not None and isfile(self.pid_path):
+            remove(self.pid_path)
+        self.process = None
+
+
+class PianobarEventListener(object):
+    """ Receives pianobar events pushed by event_command.py.
+
+        event_command.py sends one JSON datagram per event to a Unix domain
+        socket.  A daemon thread blocks on that socket and hands each event
+        to the callback as soon as it arrives, so nothing runs between songs.
+    """
+    def __init__(self, socket_path, callback, session=""):
+        self.socket_path = socket_path
+        self.callback = callback
+        self.session = session
+        self._socket = None
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        if self._running:
+            return
+        if exists(self.socket_path):
+            remove(self.socket_path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.bind(self.socket_path)
+        self._running = True
+        self._thread = Thread(target=self._run, name="PianobarEvents")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self):
+        while self._running:
+            try:
+                data = self._socket.recv(65536)
+            except Exception:
+                break
+            if not self._running:
+                break
+            try:
+                message = json.loads(data.decode())
+                if message.get("session", "") != self.session:
+                    continue  # meant for another session
+                self.callback(message["event"], message.get("info", {}),
+                              message.get("seq", 0),
+                              message.get("instance"))
+            except Exception:
+                LOG.exception("Failed to handle pianobar event")
+
+    def stop(self):
+        if not self._running:
+            return
+        self._running = False
+        # Wake the blocking recv() so the thread can exit
+        try:
+            wake = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            wake.sendto(b"", self.socket_path)
+            wake.close()
+        except Exception:
+            pass
+        self._thread.join(1)
+        self._socket.close()
+        if exists(self.socket_path):
+            remove(self.socket_path)
+
+
+class PianobarWorker(object):
+    """ Runs pianobar commands one at a time on a background thread.
+
+        Intent handlers only queue work here and return, so the messagebus
+        isn't held up while pianobar logs in or switches stations.  Work is
+        queued under a key; queuing a key that is still waiting replaces the
+        older request, so e.g. "next song" said three times while pianobar
+        is busy only skips once, and pause/resume settle on the last one.
+    """
+    def __init__(self, metrics=None):
+        self.metrics = metrics or Metrics()
+        self._pending = []  # [key, func, args] in the order to run them
+        self._changed = Condition()
+        self._thread = None
+        self._running = False
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = Thread(target=self._run, name="PianobarWorker")
+        self._thread.daemon = True
+        self._thread.start()
+
+    def submit(self, key, func, *args):
+        """ Queue func(*args) to run after anything already queued.
+
+            Args:
+                key (str): requests with the same key coalesce
+                func (callable): the work to run on the worker thread
+        """
+        with self._changed:
+            self._pending = [p for p in self._pending if p[0] != key]
+            self._pending.append([key, func, args])
+            self._changed.notify()
+
+    def _run(self):
+        while True:
+            with self._changed:
+                while self._running and not self._pending:
+                    self._changed.wait()
+                if not self._running:
+                    return
+                key, func, args = self._pending.pop(0)
+            try:
+                with self.metrics.timer("command_" + key):
+                    func(*args)
+            except Exception:
+                LOG.exception("pianobar command '" + key + "' failed")
+
+    def stop(self, timeout=2):
+        if not self._running:
+            return
+        with self._changed:
+            self._running = False
+            self._pending = []
+            self._changed.notify()
+        self._thread.join(timeout)
+
+
+class FuzzyWuzzyScorer(object):
+    """ fuzz.ratio, one station at a time.
+
+        This is pure Python difflib unless python-Levenshtein is installed,
+        so StationIndex narrows down the stations before using it.
+    """
+    name = "fuzzywuzzy"
+    batch = False
+
+    def score_all(self, query, choices):
+        return [fuzz.ratio(query, choice) for choice in choices]
+
+
+class RapidFuzzScorer(object):
+    """ rapidfuzz's ratio, scoring every station in one C call """
+    name = "rapidfuzz"
+    batch = True
+
+    def score_all(self, query, choices):
+        scores = [0] * len(choices)
+        for _, score, pos in rapidfuzz_process.extract(
+                query, choices, scorer=rapidfuzz_fuzz.ratio,
+                processor=None, limit=None):
+            scores[pos] = score
+        return scores
+
+
+SCORERS = {"fuzzywuzzy": FuzzyWuzzyScorer, "rapidfuzz": RapidFuzzScorer}
+
+
+def pick_scorer(name="auto"):
+    """ The named station scorer, or the fastest one installed for auto """
+    if name == "auto":
+        name = "rapidfuzz" if rapidfuzz_process else "fuzzywuzzy"
+    elif name == "rapidfuzz" and not rapidfuzz_process:
+        LOG.warning("rapidfuzz is not installed, using fuzzywuzzy")
+        name = "fuzzywuzzy"
+    return SCORERS.get(name, FuzzyWuzzyScorer)()
+
+
+_SOUNDEX_CODES = dict((letter, str(code)) for code, letters in enumerate(
+    ["aeiouyhw", "bfpv", "cgjkqsxz", "dt", "l", "mn", "r"])
+    for letter in letters)
+
+
+def soundex(word):
+    """ American Soundex code, e.g. "Robert" -> "R163" """
+    word = re.sub(r"[^a-z]", "", word.lower())
+    if not word:
+        return ""
+    code = word[0].upper()
+    last = _SOUNDEX_CODES[word[0]]
+    for letter in word[1:]:
+        digit = _SOUNDEX_CODES[letter]
+        if digit != "0" and digit != last:
+            code += digit
+        if letter not in "hw":
+            last = digit
+    return (code + "000")[:4]
+
+
+class StationIndex(object):
+    """ Matches spoken station names against the account's station list.
+
+        Everything that only depends on the station list (normalized names
+        and a trigram index used to narrow down candidates) is built once
+        when the list changes rather than on every utterance, and recent
+        utterances are remembered so repeated requests skip the scoring.
+
+        Scorers that can't take the whole list in one call only see the
+        stations sharing the most trigrams with the utterance, plus any
+        with a word that sounds like one of its words, so names the speech
+        recognizer spelled differently aren't left out.
+    """
+    CANDIDATES = 10  # best trigram overlaps that get a full fuzzy score
+    PRIOR_WEIGHT = 10  # most points a station's prior can add
+
+    def __init__(self, stop_words, threshold=70, cache_size=64,
+                 scorer=None):
+        words = sorted(set(w.strip().lower() for w in stop_words
+                           if w.strip()), key=len, reverse=True)
+        self.stop_words = re.compile(
+            r"\b(?:" + "|".join(re.escape(w) for w in words) + r")\b")
+        self.threshold = threshold
+        self.cache_size = cache_size
+        self.scorer = scorer or pick_scorer()
+        self._key = None
+        self._names = []        # original names, as stored in settings
+        self._normalized = []   # names as fuzzywuzzy compares them
+        self._trigrams = {}     # trigram -> set of positions in _names
+        self._sounds = {}       # soundex of a word -> positions in _names
+        self._cache = OrderedDict()
+        self.prior = None  # optional callable, station name -> 0..1
+
+    @staticmethod
+    def _grams(text):
+        text = " " + text + " "
+        return set(text[i:i + 3] for i in range(len(text) - 2))
+
+    def update(self, stations):
+        """ Rebuild the index if the station names have changed.
+
+            Args:
+                stations (list): (name, index) pairs from settings
+        """
+        key = tuple(station[0] for station in stations or [])
+        if key == self._key:
+            return
+        self._key = key
+        self._names = list(key)
+        self._normalized = [full_process(name) for name in key]
+        self._trigrams = {}
+        self._sounds = {}
+        for pos, name in enumerate(self._normalized):
+            for gram in self._grams(name):
+                self._trigrams.setdefault(gram, set()).add(pos)
+            for word in name.split():
+                self._sounds.setdefault(soundex(word), set()).add(pos)
+        self._cache.clear()
+
+    def _candidates(self, query):
+        overlap = {}
+        for gram in self._grams(query):
+            for pos in self._trigrams.get(gram, ()):
+                overlap[pos] = overlap.get(pos, 0) + 1
+        if not overlap:
+            return range(len(self._names))
+        sounds = {}
+        for word in query.split():
+            for pos in self._sounds.get(soundex(word), ()):
+                sounds[pos] = sounds.get(pos, 0) + 1
+        candidates = set(sorted(overlap, key=overlap.get,
+                                reverse=True)[:self.CANDIDATES])
+        candidates.update(sorted(sounds, key=sounds.get,
+                                 reverse=True)[:self.CANDIDATES])
+        return sorted(candidates)
+
+    def clear_cache(self):
+        """ Forget remembered matches, e.g. after the prior changed """
+        self._cache.clear()
+
+    def match(self, utterance):
+        """ Find the station named in an utterance.
+
+            If a prior is set, stations it favours get up to PRIOR_WEIGHT
+            extra points, which settles near misses and ties in favour of
+            what is usually played.
+
+            Args:
+                utterance (str): what the user said
+            Returns:
+                tuple: (station name, score), or None if nothing scored
+                       above the threshold
+        """
+        if utterance in self._cache:
+            self._cache.move_to_end(utterance)
+            return self._cache[utterance]
+
+        query = full_process(self.stop_words.sub(" ", utterance.lower()))
+        best = None
+        if query:
+            if self.scorer.batch:
+                positions = range(len(self._names))
+            else:
+                positions = self._candidates(query)
+            scores = self.scorer.score_all(
+                query, [self._normalized[pos] for pos in positions])
+            for pos, score in zip(positions, scores):
+                if self.prior:
+                    score += self.PRIOR_WEIGHT * self.prior(self._names[pos])
+                if best is None or score > best[1]:
+                    best = (self._names[pos], score)
+        if best and best[1] <= self.threshold:
+            best = None
+
+        self._cache[utterance] = best
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return best
+
+
+class PlayHistory(object):
+    """ Append-only log of what was listened to, and for how long.
+
+        Each finished song adds one line to the log.  Once the log grows
+        past max_bytes it is moved to a single backup, so the history on
+        disk never takes more than twice that.  Totals per station and per
+        station and hour of the day are kept in memory as lines are added,
+        along with the largest of each so prior() is cheap enough to call
+        for every station on every match.
+    """
+    def __init__(self, log_path, max_bytes=256 * 1024):
+        self.log_path = log_path
+        self.max_bytes = max_bytes
+        self.seconds = {}          # station -> seconds listened
+        self.hourly = {}           # (station, hour) -> seconds listened
+        self._most = 0             # largest value in seconds
+        self._most_at_hour = {}    # hour -> largest value in hourly
+        self._lock = Lock()
+
+    def load(self):
+        """ Rebuild the totals from the backup and current log """
+        with self._lock:
+            self.seconds = {}
+            self.hourly = {}
+            self._most = 0
+            self._most_at_hour = {}
+            for log_path in (self.log_path + '.1', self.log_path):
+                try:
+                    with open(log_path, 'r') as f:
+                        for line in f:
+                            try:
+                                station, hour, seconds, _ = json.loads(line)
+                            except ValueError:
+                                continue  # e.g. cut short by a crash
+                            self._add(station, hour, seconds)
+                except (IOError, OSError):
+                    pass
+
+    def _add(self, station, hour, seconds):
+        total = self.seconds[station] = self.seconds.get(station, 0) + seconds
+        self._most = max(self._most, total)
+        key = (station, hour)
+        total = self.hourly[key] = self.hourly.get(key, 0) + seconds
+        self._most_at_hour[hour] = max(self._most_at_hour.get(hour, 0), total)
+
+    def record(self, station, seconds, when=None):
+        """ Add a listen to the log.
+
+            Args:
+                station (str): station name as in settings["stations"]
+                seconds (float): how long the song was listened to
+                when (float): time the song started, defaults to now
+        """
+        when = time.time() - seconds if when is None else when
+        hour = time.localtime(when).tm_hour
+        seconds = int(seconds)
+        line = json.dumps([station, hour, seconds, int(when)],
+                          separators=(',', ':')) + '\n'
+        with self._lock:
+            self._add(station, hour, seconds)
+            try:
+                if isfile(self.log_path) and \
+                        os.path.getsize(self.log_path) > self.max_bytes:
+                    os.replace(self.log_path, self.log_path + '.1')
+                with open(self.log_path, 'a') as f:
+                    f.write(line)
+            except (IOError, OSError):
+                LOG.exception("Failed to write play history")
+
+    def prior(self, station, hour=None):
+        """ How much the station is favoured, from 0 to 1.
+
+            Half comes from its share of all listening and half from its
+            share of listening at this hour of the day.
+        """
+        hour = time.localtime().tm_hour if hour is None else hour
+        with self._lock:
+            if not self._most:
+                return 0.0
+            overall = self.seconds.get(station, 0) / float(self._most)
+            most_at_hour = self._most_at_hour.get(hour)
+            if not most_at_hour:
+                return overall / 2
+            return (overall + self.hourly.get((station, hour), 0) /
+                    float(most_at_hour)) / 2
+
+    def most_played(self):
+        with self._lock:
+            if not self.seconds:
+                return None
+            return max(self.seconds, key=self.seconds.get)
+
+
+class NowPlaying(object):
+    """ The song pianobar is currently playing """
+    __slots__ = ("artist", "title", "album", "station_name")
+
+    def __init__(self):
+        self.artist = ""
+        self.title = ""
+        self.album = ""
+        self.station_name = ""
+
+    def update(self, info):
+        """ Take the song details from a pianobar event.
+
+            Args:
+                info (dict): key/values pianobar passed to event_command.py
+            Returns:
+                bool: True if anything changed
+        """
+        new = (info.get("artist", self.artist),
+               info.get("title", self.title),
+               info.get("album", self.album),
+               info.get("stationName", self.station_name))
+        if new == (self.artist, self.title, self.album, self.station_name):
+            return False
+        self.artist, self.title, self.album, self.station_name = new
+        return True
+
+    def as_settings(self):
+        return {"song_artist": self.artist,
+                "song_title": self.title,
+                "song_album": self.album,
+                "station_name": self.station_name}
+
+
+class StationList(object):
+    """ The account's stations as (name, index) pairs.
+
+        pianobar sends the whole list with every song, but it rarely
+        changes, so it is only rebuilt when its hash differs.
+    """
+    __slots__ = ("stations", "names", "_hash")
+
+    def __init__(self):
+        self.stations = []
+        self.names = ()  # as pianobar reports them
+        self._hash = None
+
+    def update(self, info):
+        """ Take the station list from a pianobar event.
+
+            Args:
+                info (dict): key/values pianobar passed to event_command.py
+            Returns:
+                bool: True if the list changed
+        """
+        if "stationCount" not in info:
+            return False
+        count = int(info["stationCount"])
+        return self.load(info.get("station" + str(index), "")
+                         for index in range(count))
+
+    def load(self, names):
+        """ Use a list of station names, e.g. from the station cache.
+
+            Args:
+                names (iterable): station names as pianobar reports them
+            Returns:
+                bool: True if the list changed
+        """
+        names = tuple(names)
+        new_hash = hash(names)
+        if new_hash == self._hash:
+            return False
+        self._hash = new_hash
+        self.names = names
+        self.stations = [(name.replace("Radio", ""), index)
+                         for index, name in enumerate(names)]
+        return True
+
+    def as_settings(self):
+        return {"station_count": len(self.stations),
+                "stations": list(self.stations)}
+
+
+class EnclosureDisplay(object):
+    """ Sends mouth updates to the enclosure without flooding it.
+
+        The Mark 1 takes these over a slow serial link, so updates go
+        through a single pending slot: a burst of calls within the
+        debounce time sends only the last one, nothing is sent within
+        min_interval of the previous message, and a message the same as
+        what is already shown isn't sent at all.
+
+        The firmware scrolls text that doesn't fit, slowly, so the song
+        text is cut at a word to max_chars, once per track.
+    """
+    def __init__(self, enclosure=None, debounce=0.1, min_interval=0.5,
+                 max_chars=40):
+        self.enclosure = enclosure
+        self.debounce = debounce
+        self.min_interval = min_interval
+        self.max_chars = max_chars
+        self.sent = 0  # messages sent to the enclosure
+        self._track = (None, None)  # (artist, title), text for it
+        self._pending = None
+        self._shown = None
+        self._last_sent = 0
+        self._timer = None
+        self._lock = Lock()
+
+    def song(self, artist, title):
+        if self._track[0] != (artist, title):
+            self._track = ((artist, title),
+                           self._shorten(artist + ": " + title))
+        self._post(("mouth_text", self._track[1]))
+
+    def think(self):
+        self._post(("mouth_think",))
+
+    def reset(self):
+        self._post(("mouth_reset",))
+
+    def _shorten(self, text):
+        if len(text) <= self.max_chars:
+            return text
+        cut = text[:self.max_chars - 3]
+        if " " in cut:
+            cut = cut[:cut.rindex(" ")]
+        return cut.rstrip(" :-") + "..."
+
+    def _post(self, message):
+        with self._lock:
+            if self._pending is None and message == self._shown:
+                return
+            self._pending = message
+            if self._timer:
+                return  # already due, will send the latest
+            delay = max(self.debounce,
+                        self._last_sent + self.min_interval - time.time())
+            self._timer = Timer(delay, self.flush)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def flush(self):
+        """ Send the pending update now """
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            message, self._pending = self._pending, None
+            if message is None or message == self._shown:
+                return
+            self._shown = message
+            self._last_sent = time.time()
+            self.sent += 1
+        if self.enclosure:
+            getattr(self.enclosure, message[0])(*message[1:])
 
 
 class PianobarSkill(MycroftSkill):
+    # pianobar events after which the station list may have changed
+    STATION_EVENTS = ('usergetstations', 'stationcreate', 'stationdelete',
+                      'stationrename', 'stationaddgenre', 'stationaddshared')
+
+    # Playback states and the states each one may move on to.  A state can
+    # always be set again; any other change is logged and ignored.
+    TRANSITIONS = {
+        "idle": ("starting",),
+        "starting": ("paused", "playing", "error", "idle"),
+        "playing": ("paused", "autopause", "starting", "error", "idle"),
+        "paused": ("playing", "starting", "error", "idle"),
+        "autopause": ("playing", "paused", "starting", "error", "idle"),
+        "error": ("starting", "idle"),
+    }
+
+    STATION_CACHE_VERSION = 1
+    LIST_CHUNK = 5  # station names per spoken sentence
+
     def __init__(self):
         super(PianobarSkill, self).__init__(name="PianobarSkill")
-        self.process = None
-        self.piano_bar_state = None  # 'playing', 'paused', 'autopause'
+        self.pianobar = self._watch(PianobarProcess())
+        self.standby = None  # paused second session, see _prepare_standby
+        self._standby_index = None
+        self._standby_info = None
+        self._standby_target = None  # station the standby should be on
+        self._standby_lock = Lock()
+        self._standby_thread = None
+        self.metrics = Metrics()
+        self._awaiting_audio = {}  # metric name -> when it started
+        self.worker = PianobarWorker(self.metrics)
+        self.event_listener = None
+        self.now_playing = NowPlaying()
+        self.display = EnclosureDisplay()
+        self.station_list = StationList()
+        self._state_lock = Lock()
+        self._store_timer = None
+        self._info_seq = 0  # seq of the newest song info applied
+        self._subscriptions = {}  # messagebus event -> handler
+        self._state = "idle"  # see TRANSITIONS
+        self._volume_ducked = False
+        self._resume_timer = None
+        self._duck_lock = Lock()
         self.current_station = None
         self._is_setup = False
+        self._prepared = False  # _prepare_pianobar has completed
         self.vocabs = []    # keep a list of vocabulary words
+        self.station_index = None
         self.pianobar_path = expanduser('~/.config/pianobar')
+        self.history = PlayHistory(join(self.pianobar_path, 'history.log'))
+        self._list_pages = (None, [])  # (station names, page size), pages
+        self._watchdog_timer = None
+        self._watchdog_lock = Lock()
+        self._watchdog_resume = None  # None: no restart wanted, else bool
+        self._watchdog_backoff = 0  # seconds before the next restart
+        self._watchdog_restarts = 0
+        self._down_since = None
         self._pianobar_initated = False
         self.debug_mode = False
-        self.idle_count = 0
 
         # Initialize settings values
         self.settings["email"] = ""
@@ -62,45 +1168,155 @@ class PianobarSkill(MycroftSkill):
         self.settings["last_played"] = None
         self.settings['first_init'] = True  # True = first run ever
 
-        subprocess.call(["killall", "-9", "pianobar"])
-
     def initialize(self):
+        # Only cheap work happens here so skill loading isn't held up.
+        # Anything that spawns processes or touches the network is left
+        # to the worker, see on_websettings_changed.
+        started = time.time()
         self._load_vocab_files()
+        # TODO: Internationalize
+        common_words = ["to", "on", "pandora", "play"]
+        self.station_index = StationIndex(
+            self.vocabs + common_words,
+            scorer=pick_scorer(self.settings.get("station_scorer", "auto")))
+        self.station_index.prior = self.history.prior
+        self.worker.submit('history', self._load_history)
+        self._use_session(self.settings.get("session") or
+                          self._default_session())
+        self.pianobar.timeout = self.settings.get("pianobar_timeout", 15)
+        # Lets a scripted stand-in be used in place of the real client
+        self.pianobar.executable = self.settings.get("pianobar_executable",
+                                                     "pianobar")
+        self.metrics.enabled = bool(self.settings.get("metrics", False))
+        self.display.enclosure = self.enclosure
+        self._subscribe('pianobar.metrics.request',
+                        self.handle_metrics_request)
+        self.worker.start()
 
         # Check and then monitor for credential changes
         self.settings.set_changed_callback(self.on_websettings_changed)
         self.on_websettings_changed()
-        self.add_event('mycroft.stop', self.stop)
+        self._subscribe('mycroft.stop', self.stop)
+        LOG.info("Pandora skill initialized in {:.0f} ms".format(
+            (time.time() - started) * 1000))
+
+    def _use_session(self, session):
+        """ Keep this skill's pianobar files apart from other sessions.
+
+            Several devices can share a host, each with a session name of
+            its own; each then gets its own config directory, event socket,
+            caches and pid files.
+        """
+        config_home = expanduser(join('~/.config/pianobar-sessions', session))
+        self.pianobar.config_home = config_home
+        self.pianobar.session = session
+        self.pianobar_path = join(config_home, 'pianobar')
+        self.history.log_path = join(self.pianobar_path, 'history.log')
+
+    def _default_session(self):
+        """ The session name used when the "session" setting is empty.
+
+            The device's id, so devices sharing a host don't share pianobar
+            files and kill each other's player.  Before the device is paired
+            the skill's install directory tells them apart.  Hashed to keep
+            the event socket's path within the limit for Unix sockets.
+        """
+        uuid = None
+        if IdentityManager:
+            try:
+                uuid = IdentityManager.get().uuid
+            except Exception:
+                LOG.warning("Couldn't read the device id")
+        if uuid:
+            return "device-" + hashlib.sha1(uuid.encode()).hexdigest()[:12]
+        return "skill-" + hashlib.sha1(self._dir.encode()).hexdigest()[:12]
+
+    def _kill_orphans(self):
+        PianobarProcess.kill_orphans(self.pianobar.config_home,
+                                     self.pianobar.executable)
 
     ######################################################################
     # 'Auto ducking' - pause playback when Mycroft wakes
 
+    # Playback is ducked when the wake word is heard and comes back once
+    # Mycroft has gone quiet for duck_grace seconds.  Quiet is judged from
+    # messagebus events rather than by polling, so a single timer is armed
+    # when speech or a skill handler ends and cancelled when more starts.
+    #
+    # duck_mode "pause" (the default) pauses pianobar, "volume" only turns
+    # it down by duck_volume_steps presses of '(' and back up with ')'.
+
+    @property
+    def piano_bar_state(self):
+        return self._state
+
+    @piano_bar_state.setter
+    def piano_bar_state(self, state):
+        if state != self._state and \
+                state not in self.TRANSITIONS[self._state]:
+            LOG.warning("Ignoring playback state change from " +
+                        self._state + " to " + state)
+            return
+
+        # However autopause is left (resumed, paused, a new station...)
+        # the volume has to come back up if it was turned down
+        if self._volume_ducked and state != "autopause":
+            self._volume_ducked = False
+            if state != "error":  # a restarted pianobar is at full volume
+                steps = int(self.settings.get("duck_volume_steps", 10))
+                self.worker.submit('unduck', self.cmd, ")" * steps)
+        self._state = state
+
+        # Wake words only need watching while something could be ducked
+        if state == "playing":
+            self.start_monitor()
+        elif state in ("idle", "error"):
+            self.stop_monitor()
+
     def handle_listener_started(self, message):
+        # Also while already ducked: Mycroft listens again for an answer
+        # to a question, and the music must wait for that too
+        self._cancel_resume_timer()
         if self.piano_bar_state == "playing":
-            self.handle_pause()
+            if self.settings.get("duck_mode") == "volume":
+                steps = int(self.settings.get("duck_volume_steps", 10))
+                self.worker.submit('duck', self.cmd, "(" * steps)
+                self._volume_ducked = True
+            else:
+                self.worker.submit('autopause', self._autopause)
             self.piano_bar_state = "autopause"
 
-            # Start idle check
-            self.idle_count = 0
-            self.cancel_scheduled_event('IdleCheck')
-            self.schedule_repeating_event(self.check_for_idle, None,
-                                          1, name='IdleCheck')
+    def handle_activity_started(self, message=None):
+        # Mycroft started talking again, hold off resuming
+        self._cancel_resume_timer()
 
-    def check_for_idle(self):
-        if not self.piano_bar_state == "autopause":
-            self.cancel_scheduled_event('IdleCheck')
+    def handle_activity_ended(self, message=None):
+        if self.piano_bar_state != "autopause":
             return
-
-        if DisplayManager.get_active() == '':
-            # No activity, start to fall asleep
-            self.idle_count += 1
-
-            if self.idle_count >= 2:
-                # Resume playback after 2 seconds of being idle
-                self.cancel_scheduled_event('IdleCheck')
-                self.handle_resume_song()
+        with self._duck_lock:
+            if self._resume_timer:
+                self._resume_timer.cancel()
+            self._resume_timer = Timer(
+                float(self.settings.get("duck_grace", 2)),
+                self._end_auto_duck)
+            self._resume_timer.daemon = True
+            self._resume_timer.start()
+
+    def _cancel_resume_timer(self):
+        with self._duck_lock:
+            if self._resume_timer:
+                self._resume_timer.cancel()
+                self._resume_timer = None
+
+    def _end_auto_duck(self):
+        with self._duck_lock:
+            self._resume_timer = None
+        if self.piano_bar_state != "autopause":
+            return  # the user changed playback in the meantime
+        if self._volume_ducked:
+            self.piano_bar_state = "playing"
         else:
-            self.idle_count = 0
+            self.handle_resume_song()
 
     ######################################################################
 
@@ -121,9 +1337,23 @@ class PianobarSkill(MycroftSkill):
         self.register_intent(play_stations_intent, self.play_station)
 
         # Messages from the skill-playback-control / common Audio service
-        self.add_event('mycroft.audio.service.pause', self.handle_pause)
-        self.add_event('mycroft.audio.service.resume', self.handle_resume_song)
-        self.add_event('mycroft.audio.service.next', self.handle_next_song)
+        self._subscribe('mycroft.audio.service.pause', self.handle_pause)
+        self._subscribe('mycroft.audio.service.resume',
+                        self.handle_resume_song)
+        self._subscribe('mycroft.audio.service.next', self.handle_next_song)
+
+        # Used to tell when to come back from auto ducking.  The quiet
+        # after record_end only covers speech-to-text, so the resume timer
+        # is held off again once the utterance is in and a handler runs.
+        for busy in ['recognizer_loop:utterance',
+                     'mycroft.skill.handler.start',
+                     'recognizer_loop:audio_output_start']:
+            self._subscribe(busy, self.handle_activity_started)
+        for quiet in ['recognizer_loop:record_end',
+                      'recognizer_loop:audio_output_end',
+                      'mycroft.skill.handler.complete',
+                      'complete_intent_failure']:
+            self._subscribe(quiet, self.handle_activity_ended)
 
     def on_websettings_changed(self):
         if not self._is_setup:
@@ -131,38 +1361,66 @@ class PianobarSkill(MycroftSkill):
             password = self.settings.get("password", "")
             try:
                 if email and password:
-                    self._configure_pianobar()
-                    self._init_pianobar()
+                    # Stations from the last run, so requests by name work
+                    # before pianobar has reported anything
+                    self._load_station_cache()
                     self._register_all_intents()
                     self._is_setup = True
+                    # Play requests queue up behind this, so they still
+                    # find pianobar configured and logged in
+                    self.worker.submit('setup', self._prepare_pianobar)
             except Exception as e:
                 LOG.error(e)
+        elif not self._prepared:
+            # Setup failed before, e.g. with no network at boot
+            self.worker.submit('setup', self._prepare_pianobar)
 
-    def _configure_pianobar(self):
+    def _prepare_pianobar(self):
+        """ Slow setup that runs on the worker rather than at load time.
+
+            If it fails, e.g. fetching the TLS fingerprint with no network
+            at boot, it is tried again on a settings change or before
+            pianobar is next launched.
+        """
+        if self._prepared:
+            return
+        started = time.time()
+        # Listen first, so songs are reported even if a later step fails
+        self._start_event_listener()
+        if not self.pianobar.running:
+            # Clear out any orphan left over from a previous run
+            self._kill_orphans()
+        self._configure_pianobar()
+        self._prepared = True
+        self._init_pianobar()
+        LOG.info("pianobar prepared in {:.0f} ms".format(
+            (time.time() - started) * 1000))
+
+    def _configure_pianobar(self, refresh_tls=False):
         # Initialize the Pianobar configuration file
         if not exists(self.pianobar_path):
             makedirs(self.pianobar_path)
 
+        config = 'audio_quality = medium\n' + \
+                 'tls_fingerprint = {}\n' + \
+                 'user = {}\n' + \
+                 'password = {}\n' + \
+                 'event_command = {}'
+        config = config.format(self._tls_fingerprint(refresh_tls),
+                               self.settings["email"],
+                               self.settings["password"],
+                               self._dir + '/event_command.py')
+
+        # Leave the file alone unless something in it has changed
         config_path = join(self.pianobar_path, 'config')
-        with open(config_path, 'w+') as f:
-
-            # grabs the tls_key needed
-            tls_key = subprocess.check_output(
-                "openssl s_client -connect tuner.pandora.com:443 \
-                < /dev/null 2> /dev/null | openssl x509 -noout \
-                -fingerprint | tr -d ':' | cut -d'=' -f2",
-                shell=True)
-
-            config = 'audio_quality = medium\n' + \
-                     'tls_fingerprint = {}\n' + \
-                     'user = {}\n' + \
-                     'password = {}\n' + \
-                     'event_command = {}'
-
-            f.write(config.format(tls_key,
-                                  self.settings["email"],
-                                  self.settings["password"],
-                                  self._dir + '/event_command.py'))
+        new_hash = hashlib.sha1(config.encode()).hexdigest()
+        old_hash = None
+        if isfile(config_path):
+            with open(config_path, 'rb') as f:
+                old_hash = hashlib.sha1(f.read()).hexdigest()
+        if new_hash != old_hash:
+            with open(config_path, 'w') as f:
+                f.write(config)
 
         # Raspbian requires adjustments to audio output to use PulseAudio
         platform = self.config_core['enclosure'].get('platform')
@@ -175,6 +1433,46 @@ class PianobarSkill(MycroftSkill):
                 wait_while_speaking()
                 self.emitter.emit(Message('system.reboot'))
 
+    def _tls_fingerprint(self, refresh=False):
+        """ Pandora's certificate fingerprint, cached on disk.
+
+            The cached value is used until it is older than the
+            tls_fingerprint_ttl setting (seconds) or refresh is requested.
+        """
+        cache_path = join(self.pianobar_path, 'tls_fingerprint')
+        ttl = self.settings.get("tls_fingerprint_ttl", 7 * 24 * 60 * 60)
+        if not refresh and isfile(cache_path):
+            try:
+                with open(cache_path, 'r') as f:
+                    cached = json.load(f)
+                if time.time() - cached["fetched"] < ttl:
+                    return cached["fingerprint"]
+            except Exception:
+                LOG.warning("Ignoring unreadable TLS fingerprint cache")
+
+        fingerprint = fetch_tls_fingerprint()
+        with open(cache_path, 'w') as f:
+            json.dump({"fingerprint": fingerprint, "fetched": time.time()}, f)
+        return fingerprint
+
+    def _refresh_tls_after_failure(self):
+        """ Refetch the fingerprint if pianobar's login failed on TLS.
+
+            Returns:
+                bool: True if the config now has a different fingerprint
+                      and starting pianobar is worth another try
+        """
+        if not self.pianobar.saw(PianobarProcess.TLS_ERROR):
+            return False
+        LOG.info("pianobar reported a TLS error, refreshing fingerprint")
+        old_fingerprint = self._tls_fingerprint()
+        try:
+            self._configure_pianobar(refresh_tls=True)
+        except Exception:
+            LOG.exception("Failed to refresh the TLS fingerprint")
+            return False
+        return self._tls_fingerprint() != old_fingerprint
+
     def _load_vocab_files(self):
         # Keep a list of all the vocabulary words for this skill.  Later
         # these words will be removed from utterances as part of the station
@@ -191,43 +1489,138 @@ class PianobarSkill(MycroftSkill):
         else:
             LOG.error('No vocab loaded, ' + vocab_dir + ' does not exist')
 
-    def start_monitor(self):
-        # Clear any existing event
-        self.stop_monitor()
+    def _subscribe(self, name, handler):
+        """ Listen for a messagebus event unless already listening """
+        if name not in self._subscriptions:
+            self._subscriptions[name] = handler
+            self.add_event(name, handler)
 
-        # Schedule a new one every second to monitor/update display
-        self.schedule_repeating_event(self._poll_for_pianobar_update,
-                                      None, 1,
-                                      name='MonitorPianobar')
-        self.add_event('recognizer_loop:record_begin',
-                       self.handle_listener_started)
+    def _unsubscribe(self, name):
+        if self._subscriptions.pop(name, None):
+            self.remove_event(name)
+
+    @property
+    def registered_handlers(self):
+        """ Number of messagebus events the skill is listening to """
+        return len(self._subscriptions)
+
+    def start_monitor(self):
+        self._subscribe('recognizer_loop:record_begin',
+                        self.handle_listener_started)
 
     def stop_monitor(self):
-        # Clear any existing event
-        self.cancel_scheduled_event('MonitorPianobar')
+        self._unsubscribe('recognizer_loop:record_begin')
 
-    def _poll_for_pianobar_update(self, message):
-        # Checks once a second for feedback from Pianobar
+    def _start_event_listener(self):
+        if not exists(self.pianobar_path):
+            makedirs(self.pianobar_path)
+        if not self.event_listener:
+            self.event_listener = PianobarEventListener(
+                join(self.pianobar_path, 'event_socket'),
+                self._handle_pianobar_event, self.pianobar.session)
+        self.event_listener.start()
+
+    def _handle_pianobar_event(self, event, info, seq=0, instance=None):
+        # Called on the listener thread for every event pianobar reports
+        if instance and instance != self.pianobar.name:
+            # From the warm standby; keep its song for when it takes over
+            if event == 'songstart':
+                self._standby_info = (info, seq)
+            return
 
-        # 'info_ready' file is created by the event_command.py
-        # script when Pianobar sends new track information.
-        info_ready_path = join(self.pianobar_path, 'info_ready')
-        if isfile(info_ready_path):
-            self._load_current_info()
+        if info.get("pRet", "1") != "1":
+            LOG.warning("pianobar " + event + " failed: " +
+                        info.get("pRetStr", "") + " " +
+                        info.get("wRetStr", ""))
+        elif self.debug_mode:
+            LOG.info("pianobar event: " + event)
+        if seq:
+            # How long the event took to get from pianobar to here
+            self.metrics.observe("event_delay", time.time() - seq / 1e6)
+
+        if event in self.STATION_EVENTS:
+            # Pick up stations added, removed or renamed on the account.
+            # Only the station keys are used, these events may come before
+            # any song has played.
+            stations = dict((key, value) for key, value in info.items()
+                            if key == "stationCount" or
+                            (key.startswith("station") and key[7:].isdigit()))
+            self._update_current_info(stations, seq)
+        elif event == 'songstart':
+            self._update_current_info(info, seq)
+            self._audio_started()
+            self._show_now_playing()
+        elif event == 'songfinish':
+            self._record_listen(info)
+
+    def _show_now_playing(self):
+        if self.piano_bar_state == "playing":
+            self.display.song(self.now_playing.artist,
+                              self.now_playing.title)
+
+    def _load_history(self):
+        self.history.load()
+        self.station_index.clear_cache()
+
+    def _record_listen(self, info):
+        station = info.get("stationName", "").replace("Radio", "")
+        try:
+            seconds = int(info.get("songPlayed", 0))
+        except ValueError:
+            return
+        if station and seconds > 0:
+            self.history.record(station, seconds)
+            # Matches remembered so far were scored with the old prior
+            self.station_index.clear_cache()
+
+    ######################################################################
+    # Metrics, enabled with the "metrics" setting
+
+    def _mark_awaiting_audio(self, name):
+        """ Time from now until the next song starts as name """
+        if self.metrics.enabled:
+            self._awaiting_audio[name] = time.time()
+
+    def _audio_started(self):
+        if not self.metrics.enabled:
+            return
+        now = time.time()
+        for name, started in list(self._awaiting_audio.items()):
+            self.metrics.observe(name, now - started)
+        self._awaiting_audio.clear()
+        self.metrics.set_counter("restarts_total", self.pianobar.restarts)
+        textfile = self.settings.get("metrics_textfile")
+        if textfile:
             try:
-                remove(info_ready_path)
-            except Exception as e:
-                LOG.error(e)
+                self.metrics.write_textfile(expanduser(textfile))
+            except (IOError, OSError):
+                LOG.exception("Failed to write " + textfile)
 
-            # Update the "Now Playing song"
-            LOG.info("State: "+str(self.piano_bar_state))
-            if self.piano_bar_state == "playing":
-                self.enclosure.mouth_text(self.settings["song_artist"] + ": " +
-                                          self.settings["song_title"])
+    def handle_metrics_request(self, message=None):
+        data = self.metrics.snapshot()
+        data["enabled"] = self.metrics.enabled
+        data["counters"]["restarts_total"] = self.pianobar.restarts
+        data["counters"]["watchdog_restarts_total"] = self._watchdog_restarts
+        self.emitter.emit(Message('pianobar.metrics.response', data))
+
+    ######################################################################
+
+    @property
+    def process(self):
+        """ The live pianobar Popen object, or None if not running """
+        if self.pianobar.running:
+            return self.pianobar.process
+        return None
 
     def cmd(self, s):
-        self.process.stdin.write(s.encode())
-        self.process.stdin.flush()
+        """ Send keys to pianobar, recovering it first if it has died """
+        try:
+            self.pianobar.send(s)
+        except PianobarExited as e:
+            LOG.warning(str(e) + ", recovering it")
+            self._recover_now()
+            if self.process:
+                self.pianobar.send(s)
 
     def _init_pianobar(self):
         if self.settings.get('first_init') is False:
@@ -237,26 +1630,27 @@ class PianobarSkill(MycroftSkill):
         # by Mycroft.
         try:
             LOG.info("INIT PIANOBAR")
-            subprocess.call(["killall", "-9", "pianobar"])
-            self.process = subprocess.Popen(["pianobar"],
-                                            stdin=subprocess.PIPE,
-                                            stdout=subprocess.PIPE)
-            time.sleep(3)
-            self.cmd("0\n")
-            self.cmd("S")
-            time.sleep(0.5)
-            self.process.kill()
+            self._kill_orphans()
+            self.pianobar.start()
+            self.pianobar.select_first_station(0)
+            self.pianobar.send("S")
+            # The time ticker shows once songstart has been handled
+            self.pianobar.wait_for(PianobarProcess.PLAYING)
+            self.pianobar.stop()
             self.settings['first_init'] = False
             self._load_current_info()
         except Exception as e:
+            self.pianobar.stop()
+            if self._refresh_tls_after_failure():
+                return self._init_pianobar()
             LOG.exception('Failed to connect to Pandora')
             self.speak_dialog('wrong.credentials')
 
-        self.process = None
-
     def _load_current_info(self):
         # Load the 'info' file created by Pianobar when changing tracks
         info_path = join(self.pianobar_path, 'info')
+        if self.pianobar.name != "main":
+            info_path += '.' + self.pianobar.name
 
         # this is a hack to remove the info_path
         # if it's a directory. An earlier version
@@ -266,55 +1660,403 @@ class PianobarSkill(MycroftSkill):
         if isdir(info_path):
             shutil.rmtree(info_path)
 
-        if not exists(info_path):
-            with open(info_path, 'w+'):
-                pass
-
-        with open(info_path, 'r') as f:
-            info = json.load(f)
-
-        # Save the song info for later display
-        self.settings["song_artist"] = info["artist"]
-        self.settings["song_title"] = info["title"]
-        self.settings["song_album"] = info["album"]
-
-        self.settings["station_name"] = info["stationName"]
+        # event_command.py renames complete files into place, but the file
+        # may not exist yet or be left over from an older version
+        try:
+            with open(info_path, 'r') as f:
+                data = json.load(f)
+        except (IOError, OSError, ValueError):
+            LOG.info("No song info available yet")
+            return
+        if isinstance(data, dict):
+            self._update_current_info(data.get("info", data),
+                                      data.get("seq", 0))
+
+    def _update_current_info(self, info, seq=0, force=False):
+        # Save the song info for later display.  Only what changed is
+        # copied into settings, in one update, and the write to disk is
+        # put off so a burst of events only stores once.  force applies
+        # info even if it is older, as when the standby takes over.
+        with self._state_lock:
+            if seq < self._info_seq and not force:
+                return  # an older song than the one already shown
+            self._info_seq = seq
+            changes = {}
+            if self.now_playing.update(info):
+                changes.update(self.now_playing.as_settings())
+            stations_changed = self.station_list.update(info)
+            if stations_changed:
+                changes.update(self.station_list.as_settings())
+            if not changes:
+                return
+            self.settings.update(changes)
+        if stations_changed:
+            self._save_station_cache()
         if self.debug_mode:
             LOG.info("Station name: " + str(self.settings['station_name']))
-        self.settings["station_count"] = int(info["stationCount"])
-        self.settings["stations"] = []
-        for index in range(self.settings["station_count"]):
-            station = "station" + str(index)
-            self.settings["stations"].append(
-                (info[station].replace("Radio", ""), index))
-        if self.debug_mode:
             LOG.info("Stations: "+str(self.settings["stations"]))
-        # self.settings.store()
+        self._schedule_store()
 
-    def _launch_pianobar_process(self):
+    def _account_stamp(self):
+        email = self.settings.get("email", "").strip().lower()
+        return hashlib.sha1(email.encode()).hexdigest()
+
+    def _load_station_cache(self):
+        """ Restore the station list saved for this Pandora account """
+        cache_path = join(self.pianobar_path, 'stations.json')
         try:
+            with open(cache_path, 'r') as f:
+                cache = json.load(f)
+        except (IOError, OSError, ValueError):
+            return
+        if cache.get("version") != self.STATION_CACHE_VERSION or \
+                cache.get("account") != self._account_stamp():
+            return
+        with self._state_lock:
+            if self.station_list.load(cache.get("stations", [])):
+                self.settings.update(self.station_list.as_settings())
+        LOG.info("Loaded " + str(len(self.station_list.stations)) +
+                 " cached stations")
+
+    def _save_station_cache(self):
+        cache_path = join(self.pianobar_path, 'stations.json')
+        tmp_path = cache_path + '.tmp'
+        cache = {"version": self.STATION_CACHE_VERSION,
+                 "account": self._account_stamp(),
+                 "updated": time.time(),
+                 "stations": list(self.station_list.names)}
+        try:
+            with open(tmp_path, 'w') as f:
+                json.dump(cache, f)
+            os.replace(tmp_path, cache_path)
+        except (IOError, OSError):
+            LOG.exception("Failed to save the station cache")
+
+    def _schedule_store(self, delay=5):
+        """ Store settings once no more changes arrive for delay seconds """
+        with self._state_lock:
+            if self._store_timer:
+                self._store_timer.cancel()
+            self._store_timer = Timer(delay, self._store_settings)
+            self._store_timer.daemon = True
+            self._store_timer.start()
+
+    def _store_settings(self):
+        with self._state_lock:
+            self._store_timer = None
+            try:
+                self.settings.store()
+            except Exception:
+                LOG.exception("Failed to store settings")
+
+    def _launch_pianobar_process(self, quiet=False):
+        """ Make sure a logged-in pianobar session is available.
+
+            An already running session is reused as-is; a new process is
+            only spawned on first use or after the previous one died.
+
+            Args:
+                quiet (bool): don't tell the user about a failed login
+        """
+        if self.pianobar.running:
+            return
+        self.piano_bar_state = "starting"
+        try:
+            self._prepare_pianobar()
             LOG.info("Starting Pianobar process")
-            subprocess.call(["killall", "-9", "pianobar"])
-            time.sleep(1)
+            if self.pianobar.process is None and not self.standby:
+                # Clear out any orphan left over from a previous run
+                self._kill_orphans()
 
             # start pandora
-            if self.debug_mode:
-                self.process = \
-                    subprocess.Popen(["pianobar"], stdin=subprocess.PIPE)
-            else:
-                self.process = subprocess.Popen(["pianobar"],
-                                                stdin=subprocess.PIPE,
-                                                stdout=subprocess.PIPE)
+            self.pianobar.debug_mode = self.debug_mode
+            self.pianobar.start()
             self.current_station = "0"
-            self.cmd("0\n")
-            self.handle_pause()
-            time.sleep(2)
+            self.pianobar.select_first_station(0)
+            self.pianobar.send("S")
+            self.piano_bar_state = "paused"
+            # The time ticker shows once songstart has been handled
+            self.pianobar.wait_for(PianobarProcess.PLAYING)
             self._load_current_info()
             LOG.info("Pianobar process initialized")
         except Exception:
+            self.pianobar.stop()
+            self.piano_bar_state = "error"
+            if self._refresh_tls_after_failure():
+                return self._launch_pianobar_process(quiet)
             LOG.exception('Failed to connect to Pandora')
-            self.speak_dialog('wrong.credentials')
-            self.process = None
+            if not quiet:
+                self.speak_dialog('wrong.credentials')
+
+    def _change_station(self, index):
+        if index == self.pianobar.station:
+            # Already tuned in, e.g. the first station after a launch.
+            # Just play it, as a station change would; no songstart
+            # follows to take the thinking animation off the mouth.
+            self.pianobar.send("P")
+            if self.now_playing.title:
+                self.display.song(self.now_playing.artist,
+                                  self.now_playing.title)
+            return
+        self._mark_awaiting_audio("station_switch")
+        if not self._swap_to_standby(index):
+            self.pianobar.change_station(index)
+
+    ######################################################################
+    # Watchdog.  The output reader sees the pipe close when pianobar dies,
+    # so nothing polls for it.  A crash while in use is restarted after a
+    # delay that doubles with each failure, and the last station is tuned
+    # in again.  pianobar can't seek, so the song itself starts over.
+    # A command that finds the pipe broken runs the same recovery at once
+    # rather than waiting out the delay, see cmd().
+
+    WATCHDOG_BACKOFF = (2, 300)  # first and longest delay, seconds
+    WATCHDOG_STABLE = 60  # a run this long resets the delay
+
+    def _watch(self, pianobar):
+        pianobar.on_exit = self._handle_pianobar_exit
+        pianobar.subscribe("error", lambda message: LOG.warning(
+            "pianobar " + pianobar.name + ": " + message))
+        return pianobar
+
+    def _handle_pianobar_exit(self, pianobar, code, reason):
+        """ Called from the output reader thread when pianobar exits """
+        if pianobar is self.standby:
+            LOG.warning("Standby pianobar exited ({}, {})".format(code,
+                                                                  reason))
+            self.worker.submit('standby', self._stop_standby)
+            return
+        if pianobar is not self.pianobar:
+            return
+        with self._watchdog_lock:
+            if not self._mark_down():
+                return
+            LOG.error("pianobar exited with code {} ({})".format(code,
+                                                                 reason))
+            if reason != "login":
+                if time.time() - (pianobar.started_at or 0) > \
+                        self.WATCHDOG_STABLE:
+                    self._watchdog_backoff = 0
+                self._schedule_recovery()
+                return
+            # Retrying would only fail the same way until settings change
+            self._watchdog_resume = None
+        self.speak_dialog('wrong.credentials')
+
+    def _mark_down(self):
+        """ Note that pianobar died while in use, once per exit.
+
+            Called with _watchdog_lock held.
+
+            Returns:
+                bool: True if this call is the one that noticed
+        """
+        state = self.piano_bar_state
+        if self.pianobar.running or \
+                state not in ("playing", "paused", "autopause"):
+            return False  # launching, not in use or already noticed
+        if self._down_since is None:
+            self._down_since = time.time()
+        # A restart that died part way still resumes if it was to
+        self._watchdog_resume = state != "paused" or \
+            bool(self._watchdog_resume)
+        self.piano_bar_state = "error"
+        return True
+
+    def _recover_now(self):
+        with self._watchdog_lock:
+            # The exit may not have reached _handle_pianobar_exit yet
+            self._mark_down()
+            if self.piano_bar_state != "error" or \
+                    self._watchdog_resume is None:
+                return
+            self._cancel_watchdog()
+        self._recover()
+
+    def _schedule_recovery(self):
+        first, longest = self.WATCHDOG_BACKOFF
+        self._watchdog_backoff = min(longest,
+                                     self._watchdog_backoff * 2 or first)
+        LOG.info("Restarting pianobar in {} s".format(self._watchdog_backoff))
+        self._cancel_watchdog()
+        self._watchdog_timer = Timer(
+            self._watchdog_backoff, self.worker.submit,
+            ('watchdog', self._recover))
+        self._watchdog_timer.daemon = True
+        self._watchdog_timer.start()
+
+    def _cancel_watchdog(self):
+        if self._watchdog_timer:
+            self._watchdog_timer.cancel()
+            self._watchdog_timer = None
+
+    def _recover(self):
+        resume = self._watchdog_resume
+        if self.piano_bar_state != "error" or resume is None:
+            return  # stopped, or recovered some other way meanwhile
+        station = self.current_station
+        self._launch_pianobar_process(quiet=True)
+        if not self.process:
+            with self._watchdog_lock:
+                self._schedule_recovery()
+            return
+        try:
+            if station and station != self.current_station:
+                self._change_station(int(station))
+                self.current_station = station
+            if resume:
+                self.pianobar.send("P")
+                self.piano_bar_state = "playing"
+        except (PianobarExited, PianobarTimeout):
+            return  # the new process died too, its exit is handled
+        self._watchdog_resume = None
+        self._watchdog_restarts += 1
+        self.metrics.set_counter("watchdog_restarts_total",
+                                 self._watchdog_restarts)
+        if self._down_since:
+            self.metrics.observe("downtime", time.time() - self._down_since)
+            self._down_since = None
+        LOG.info("pianobar recovered on station " + str(station))
+
+    ######################################################################
+    # Warm standby, enabled with the "warm_standby" setting.  A second,
+    # paused pianobar is kept tuned to the station most likely to be asked
+    # for next, so switching to it only swaps which process plays.  It
+    # costs a second process and Pandora connection, hence opt-in.
+    #
+    # Warming up means a login and a playlist fetch, so it runs on its
+    # own thread rather than holding up the command worker.  A prediction
+    # made while one is warming up is picked up once it is done.
+
+    def _schedule_standby(self, stepping=False):
+        """ Aim the standby at the station likely to be asked for next
+
+            Args:
+                stepping (bool): the user is going through the stations in
+                                 order with "next station"
+        """
+        if not self.settings.get("warm_standby", False):
+            return
+        index = self._predict_next_station(stepping)
+        with self._standby_lock:
+            self._standby_target = index
+            if self._standby_thread:
+                return
+            self._standby_thread = Thread(target=self._prepare_standby,
+                                          name="PianobarStandby")
+            self._standby_thread.daemon = True
+            self._standby_thread.start()
+
+    def _predict_next_station(self, stepping=False):
+        stations = self.settings.get("stations") or []
+        if not stations or self.current_station is None:
+            return None
+        current = int(self.current_station)
+        if not stepping:
+            # Otherwise the household's favourite is the best guess
+            favourite = self.history.most_played()
+            for name, index in stations:
+                if name == favourite and index != current:
+                    return index
+        return (current + 1) % len(stations)
+
+    def _prepare_standby(self):
+        # Runs until the standby was warmed for the latest target
+        index = None
+        while True:
+            with self._standby_lock:
+                target = self._standby_target
+                ready = self.standby and self.standby.running and \
+                    self._standby_index == target
+                if target == index or target is None or ready:
+                    self._standby_thread = None
+                    return
+            index = target
+            try:
+                self._warm_standby(index)
+            except Exception:
+                LOG.exception("Failed to prepare the standby pianobar")
+
+    def _warm_standby(self, index):
+        if not self.pianobar.running:
+            return
+        self._stop_standby()
+
+        name = "b" if self.pianobar.name == "a" else "a"
+        standby = PianobarProcess(self.pianobar.timeout,
+                                  self.pianobar.executable, name,
+                                  self.pianobar.config_home,
+                                  self.pianobar.session)
+        self._watch(standby)
+        try:
+            standby.start()
+            standby.select_first_station(index)
+            standby.send("S")
+            standby.wait_for(PianobarProcess.PLAYING)
+        except Exception:
+            LOG.exception("Failed to start the standby pianobar")
+            standby.stop()
+            return
+        with self._standby_lock:
+            # The main session may have been stopped or swapped meanwhile
+            wanted = self.standby is None and self.pianobar.running and \
+                self.pianobar.name != name
+            if wanted:
+                self.standby = standby
+                self._standby_index = index
+        if not wanted:
+            standby.stop()
+            return
+        LOG.info("Standby pianobar ready on station " + str(index) +
+                 ", RSS " + str(self._rss_kb(standby)) + " kB")
+
+    @staticmethod
+    def _rss_kb(pianobar):
+        try:
+            with open("/proc/{}/status".format(pianobar.process.pid)) as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except (IOError, OSError, ValueError, AttributeError):
+            pass
+        return None
+
+    def _swap_to_standby(self, index):
+        """ Switch to index by making the standby session the main one.
+
+            Returns:
+                bool: False if there is no standby ready on that station
+        """
+        with self._standby_lock:
+            standby = self.standby
+            if not standby or not standby.running or \
+                    self._standby_index != index:
+                return False
+            old = self.pianobar
+            self.pianobar, self.standby = standby, None
+            self._standby_index = None
+            info, self._standby_info = self._standby_info, None
+        # Keep restarts_total counting up across the swap
+        self.pianobar.restarts += old.restarts
+        try:
+            old.send("S")
+        except PianobarExited:
+            pass
+        self.pianobar.send("P")
+        old.stop()
+        if info:
+            # Its songstart came before the main session's latest one
+            self._update_current_info(*info, force=True)
+            self._show_now_playing()
+        return True
+
+    def _stop_standby(self):
+        with self._standby_lock:
+            standby, self.standby = self.standby, None
+            self._standby_index = None
+            self._standby_info = None
+        if standby:
+            standby.stop()
 
     def _extract_station(self, utterance):
         """
@@ -322,32 +2064,20 @@ class PianobarSkill(MycroftSkill):
             and return station with highest probability
         """
         try:
-            # TODO: Internationalize
-
-            common_words = [" to ", " on ", " pandora", " play"]
-            for vocab in self.vocabs:
-                utterance = utterance.replace(vocab, "")
-
-            # strip out other non important words
-            for words in common_words:
-                utterance = utterance.replace(words, "")
-
-            utterance.lstrip()
-            stations = [station[0] for station in self.settings["stations"]]
-            probabilities = fuzz_process.extractOne(
-                utterance, stations, scorer=fuzz.ratio)
+            with self.metrics.timer("extract_station"):
+                # Only rebuilds when the station list has changed
+                self.station_index.update(self.settings.get("stations"))
+                probabilities = self.station_index.match(utterance)
             if self.debug_mode:
                 LOG.info("Probabilities: " + str(probabilities))
-            if probabilities[1] > 70:
-                station = probabilities[0]
-                return station
-            else:
-                return None
+            if probabilities:
+                return probabilities[0]
+            return None
         except Exception as e:
             LOG.info(e)
             return None
 
-    def _play_station(self, station, dialog=None):
+    def _play_station(self, station, dialog=None, stepping=False):
         LOG.info("Starting: "+str(station))
         self._launch_pianobar_process()
         
@@ -360,23 +2090,17 @@ class PianobarSkill(MycroftSkill):
             if station:
                 self.speak_dialog("playing.station", {"station": station})
 
-        self.enclosure.mouth_think()
+        self.display.think()
         if station:
             for channel in self.settings.get("stations"):
                 if station == channel[0]:
-                    self.cmd("s")
                     self.current_station = str(channel[1])
-                    station_number = str(channel[1]) + "\n"
-                    self.cmd(station_number)
+                    self._change_station(channel[1])
                     self.piano_bar_state = "playing"
                     self.settings["last_played"] = channel
-                    self.start_monitor()
         else:
-            time.sleep(2)  # wait for pianobar to loading
             if self.debug_mode:
                 LOG.info(self.settings.get('stations'))
-            # try catch block because some systems
-            # may not load pianobar info in time
             try:
                 channel = self.settings.get("stations")[0]
                 if self.debug_mode:
@@ -385,10 +2109,10 @@ class PianobarSkill(MycroftSkill):
                     self.speak_dialog(
                         "playing.station", {"station": channel[0]}
                         )
-                    station_number = str(channel[1]) + "\n"
                     if self.debug_mode:
-                        LOG.info(station_number)
-                    self.cmd(station_number)
+                        LOG.info(channel[1])
+                    self.current_station = str(channel[1])
+                    self._change_station(channel[1])
                     self.settings["last_played"] = channel
                 else:
                     raise ValueError
@@ -396,10 +2120,10 @@ class PianobarSkill(MycroftSkill):
                 LOG.info(e)
                 self.speak_dialog("playing.station", {"station": "pandora"})
                 self.current_station = "0"
-                self.cmd("0\n")
-            self.handle_resume_song()
+                self._change_station(0)
+            self._resume()
             self.piano_bar_state = "playing"
-            self.start_monitor()
+        self._schedule_standby(stepping)
 
     @intent_handler(IntentBuilder("").require("Play").require("Pandora"))
     def play_pandora(self, message=None):
@@ -422,38 +2146,52 @@ class PianobarSkill(MycroftSkill):
                         station = self.settings["stations"][0][0]
 
             # Play specified station
-            self._play_station(station, dialog)
+            self._mark_awaiting_audio("intent_to_audio")
+            self.worker.submit('play', self._play_station, station, dialog)
         else:
             # Lead user to setup for Pandora
             self.speak_dialog("please.register.pandora")
 
     def handle_next_song(self, message=None):
         if self.process and self.piano_bar_state == "playing":
-            self.enclosure.mouth_think()
-            self.cmd("n")
-            self.piano_bar_state = "playing"
-            self.start_monitor()
+            self.display.think()
+            self.worker.submit('next_song', self.cmd, "n")
 
     def handle_next_station(self, message=None):
         if self.process and self.settings.get("stations"):
-            new_station = int(self.current_station) + 1
-            if new_station >= int(self.settings.get("station_count", 0)):
-                new_station = 0
-            new_station = self.settings["stations"][new_station][0]
-            self._play_station(new_station)
+            self._mark_awaiting_audio("intent_to_audio")
+            self.worker.submit('play', self._next_station)
+
+    def _next_station(self):
+        # Runs on the worker so current_station reflects earlier requests
+        new_station = int(self.current_station) + 1
+        if new_station >= int(self.settings.get("station_count", 0)):
+            new_station = 0
+        new_station = self.settings["stations"][new_station][0]
+        self._play_station(new_station, stepping=True)
 
     def handle_pause(self, message=None):
+        self.worker.submit('playback', self._pause)
+
+    def handle_resume_song(self, message=None):
+        self.worker.submit('playback', self._resume)
+
+    # These run on the worker, after any station change queued before
+    # them, and only then set piano_bar_state so it matches pianobar.
+    def _pause(self):
         if self.process:
             self.cmd("S")
-            self.process.stdin.flush()
             self.piano_bar_state = "paused"
-            self.stop_monitor()
 
-    def handle_resume_song(self, message=None):
+    def _resume(self):
         if self.process:
             self.cmd("P")
             self.piano_bar_state = "playing"
-            self.start_monitor()
+
+    def _autopause(self):
+        # Skipped if the user paused or changed playback meanwhile
+        if self.process and self.piano_bar_state == "autopause":
+            self.cmd("S")
 
     def play_station(self, message=None):
         if self._is_setup:
@@ -462,18 +2200,61 @@ class PianobarSkill(MycroftSkill):
             station = self._extract_station(message.data["utterance"])
 
             if station is not None:
-                self._play_station(station)
+                self._mark_awaiting_audio("intent_to_audio")
+                self.worker.submit('play', self._play_station, station)
             else:
                 self.speak_dialog("no.matching.station")
         else:
             # Lead user to setup for Pandora
             self.speak_dialog("please.register.pandora")
 
-    def handle_list(self, message=None):
-        is_playing = self.piano_bar_state == "playing"
-        if is_playing:
-            self.handle_pause()
+    def _station_list_pages(self, names):
+        """ The spoken station list, split into pages of short sentences.
+
+            Short sentences let speech start after the first few names
+            while the rest are synthesized, however many stations there
+            are.  The result is kept until the station list changes.
 
+            Returns:
+                list: (sentences, number of stations) for each page
+        """
+        page_size = max(int(self.settings.get("list_page_size", 10)), 1)
+        key = (tuple(names), page_size)
+        if self._list_pages[0] == key:
+            return self._list_pages[1]
+
+        pages = []
+        page_names = self._runs(names, page_size)
+        for number, page in enumerate(page_names):
+            chunks = self._runs(page, self.LIST_CHUNK)
+            sentences = [', '.join(chunk) for chunk in chunks]
+            if number == len(page_names) - 1 and len(names) > 1:
+                # The very end of the list
+                chunk = chunks[-1]
+                last = self.translate("and") + " " + chunk[-1]
+                sentences[-1] = ' '.join(
+                    [', '.join(chunk[:-1]), last]).strip()
+            pages.append((sentences, len(page)))
+        self._list_pages = (key, pages)
+        return pages
+
+    @staticmethod
+    def _runs(items, size):
+        """ items split into lists of size, a single leftover joining the
+            one before so a lone name is never a sentence or page of its own
+        """
+        runs = [items[i:i + size] for i in range(0, len(items), size)]
+        if len(runs) > 1 and len(runs[-1]) == 1:
+            last = runs.pop()
+            runs[-1] = runs[-1] + last
+        return runs
+
+    def _wants_more(self, answer):
+        answer = " " + (answer or "").lower() + " "
+        return any(" " + word.lower() + " " in answer
+                   for word in self.translate_list("more"))
+
+    def handle_list(self, message=None):
         # build the list of stations
         l = []
         for station in self.settings.get("stations"):
@@ -482,22 +2263,36 @@ class PianobarSkill(MycroftSkill):
             self.speak_dialog("no.stations")
             return
 
-        # read the list
-        if len(l) > 1:
-            list = ', '.join(l[:-1]) + " " + \
-                   self.translate("and") + " " + l[-1]
-        else:
-            list = str(l)
-        self.speak_dialog("subscribed.to.stations", {"stations": list})
+        is_playing = self.piano_bar_state == "playing"
+        if is_playing:
+            self.handle_pause()
+
+        # read the list a page at a time, asking before each further page
+        pages = self._station_list_pages(l)
+        remaining = len(l)
+        for number, (sentences, count) in enumerate(pages):
+            if number == 0:
+                self.speak_dialog("subscribed.to.stations",
+                                  {"stations": sentences[0]})
+            else:
+                answer = self.get_response(
+                    "more.station" if remaining == 1 else "more.stations",
+                    {"count": remaining})
+                if not self._wants_more(answer):
+                    break
+                self.speak(sentences[0])
+            for sentence in sentences[1:]:
+                self.speak(sentence)
+            remaining -= count
 
         if is_playing:
             wait_while_speaking()
             self.handle_resume_song()
 
     def stop(self):
-        if self.piano_bar_state and not self.piano_bar_state == "paused":
+        if self.piano_bar_state in ("playing", "autopause"):
             self.handle_pause()
-            self.enclosure.mouth_reset()
+            self.display.reset()
             return True
 
     @intent_handler(IntentBuilder("").require("Pandora").
@@ -515,14 +2310,23 @@ class PianobarSkill(MycroftSkill):
             self.speak_dialog("leaving.debug.mode")
 
     def shutdown(self):
-        self.stop_monitor()
+        self._cancel_resume_timer()
+        self._cancel_watchdog()
+        self.worker.stop()
+        if self._store_timer:
+            self._store_timer.cancel()
+            self._store_settings()
+        if self.event_listener:
+            self.event_listener.stop()
 
         # Clean up before shutting down the skill
         if self.piano_bar_state == "playing":
-            self.enclosure.mouth_reset()
+            self.display.reset()
+        self.display.flush()
 
-        if self.process:
-            self.cmd("q")
+        self._stop_standby()
+        self.pianobar.stop()
+        self.piano_bar_state = "idle"
         super(PianobarSkill, self).shutdown()
 
 
@@ -22,55 +22,83 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
 # SOFTWARE.
 
-import os
-import sys
-import json
-import shutil
-from os.path import expanduser, join, abspath, isdir
-from threading import Thread
 """
     This module is used as a callback for pianobar events. pianobar
     emits different events and calls this module for every event.
     The events can be captured in event variable.
+
+    pianobar starts a new interpreter for every event, so this script keeps
+    its imports to the bare minimum.  The C modules behind json and socket
+    are used directly because the Python wrappers pull in re, enum and
+    selectors, which cost more than everything else the script does.
 """
+import os
+import sys
+import time
+import _socket
+try:
+    from _json import encode_basestring_ascii as quote
+except ImportError:
+    from json import dumps as quote
 
 __author__ = 'MichaelNguyen'
 
 path = os.environ.get('XDG_CONFIG_HOME')
 if not path:
-    path = expanduser("~/.config")
+    path = os.path.expanduser("~/.config")
 else:
-    path = expanduser(path)
+    path = os.path.expanduser(path)
 
-now_playing = join(path, 'pianobar', 'info')
+now_playing = os.path.join(path, 'pianobar', 'info')
+event_socket = os.path.join(path, 'pianobar', 'event_socket')
 
-info = sys.stdin.readlines()
 event = sys.argv[1]
+# Set by the skill when it runs more than one pianobar
+instance = os.environ.get('PIANOBAR_INSTANCE', '')
+session = os.environ.get('PIANOBAR_SESSION', '')
+if instance and instance != 'main':
+    now_playing += '.' + instance
+# Lets the skill tell which of two events is newer
+seq = str(int(time.time() * 1000000))
 
-if event == 'songstart':
-    song_dict = {}
-    for item in info:
-        item = item.split("=")
-        song_dict[item[0]] = item[1].rstrip()
+# pianobar passes key=value lines; every value is a string, so the JSON
+# object can be put together directly
+fields = []
+for line in sys.stdin:
+    key, sep, value = line.partition("=")
+    if sep:
+        fields.append(quote(key) + ":" + quote(value.rstrip()))
+song_json = "{" + ",".join(fields) + "}"
 
+if event == 'songstart':
     # this is a hack to remove the info_path
     # if it's a directory. An earlier version
     # of code may sometimes create info_path as
     # a directory instead of a file path
     # date: 02-18
-    if isdir(now_playing):
+    if os.path.isdir(now_playing):
+        import shutil
         shutil.rmtree(now_playing)
 
-    with open(now_playing, 'w') as f:
-        json.dump(song_dict, f)
+    # Write to a private file and rename it into place, so a reader only
+    # ever sees the previous complete file or the new complete file.
+    tmp_path = now_playing + '.' + str(os.getpid())
+    try:
+        with open(tmp_path, 'w') as f:
+            f.write('{"seq":' + seq + ',"info":' + song_json + '}')
+        os.replace(tmp_path, now_playing)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
-    # HACKY! This creates a file to notify the pianobar skill
-    # to load the information
-    pianobar_path = join(expanduser('~/.config/pianobar'), 'info_ready')
-    with open(pianobar_path, 'w+') as f:
-        pass
-# elif event == "userlogin":
-#     with open("./settings.json", "w") as f:
-#         settings = json.load(f)
-#         settings["info"] = str(info)
-#         json.dump(settings, f)
+# Push every event to the skill, which listens on a Unix domain socket.  If
+# the skill isn't running there is nobody to tell, so failures are ignored.
+try:
+    sock = _socket.socket(_socket.AF_UNIX, _socket.SOCK_DGRAM)
+    sock.sendto(('{"event":' + quote(event) + ',"seq":' + seq +
+                 ',"instance":' + quote(instance) +
+                 ',"session":' + quote(session) +
+                 ',"info":' + song_json + '}').encode(), event_socket)
+    sock.close()
+except Exception:
+    pass
@@ -0,0 +1,134 @@
+"""
+    Shared fixtures: the skill loaded against stubbed Mycroft modules, and
+    a PianobarSkill driving test/fake_pianobar.py in a throwaway home.
+"""
+import importlib.util
+import json
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from os.path import abspath, dirname, join
+from pathlib import Path
+
+import pytest
+
+TEST_DIR = dirname(abspath(__file__))
+SKILL_DIR = dirname(TEST_DIR)
+FAKE_PIANOBAR = join(TEST_DIR, "fake_pianobar.py")
+EVENT_COMMAND = join(SKILL_DIR, "event_command.py")
+SESSION = "test"  # the pianobar session skills are given
+
+sys.path.insert(0, join(TEST_DIR, "stubs"))
+
+
+def pytest_configure(config):
+    # fuzzywuzzy warns on import when python-Levenshtein is missing
+    config.addinivalue_line("filterwarnings",
+                            "ignore:Using slow pure-python")
+
+
+def load_skill_module():
+    if "pianobar_skill" not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            "pianobar_skill", join(SKILL_DIR, "__init__.py"),
+            submodule_search_locations=[SKILL_DIR])
+        module = importlib.util.module_from_spec(spec)
+        sys.modules["pianobar_skill"] = module
+        spec.loader.exec_module(module)
+    return sys.modules["pianobar_skill"]
+
+
+def session_home(home):
+    """ The XDG_CONFIG_HOME of the SESSION pianobar session in home """
+    return home / ".config" / "pianobar-sessions" / SESSION
+
+
+def wait_until(condition, timeout=10):
+    """ Poll condition until it is true, failing the test on timeout """
+    deadline = time.time() + timeout
+    while not condition():
+        if time.time() > deadline:
+            pytest.fail("timed out waiting for " + condition.__name__)
+        time.sleep(0.005)
+
+
+def drain(skill, timeout=10):
+    """ Wait for everything queued on the skill's worker to have run """
+    done = threading.Event()
+    skill.worker.submit("drain-" + str(id(done)), done.set)
+    assert done.wait(timeout), "worker didn't drain"
+
+
+@pytest.fixture(scope="session")
+def skill_module():
+    return load_skill_module()
+
+
+@pytest.fixture
+def home(monkeypatch):
+    """ A fresh home directory with Pandora's TLS fingerprint cached """
+    # Not in path: the event socket's path has to fit in 108 bytes
+    path = Path(tempfile.mkdtemp(prefix="pianobar-home-"))
+    monkeypatch.setenv("HOME", str(path))
+    monkeypatch.delenv("XDG_CONFIG_HOME", raising=False)
+    monkeypatch.setenv("FAKE_PIANOBAR_TICK", "0.2")
+    pianobar_path = session_home(path) / "pianobar"
+    pianobar_path.mkdir(parents=True)
+    (pianobar_path / "tls_fingerprint").write_text(json.dumps(
+        {"fingerprint": "0" * 40, "fetched": time.time()}))
+    yield path
+    shutil.rmtree(str(path), ignore_errors=True)
+
+
+@pytest.fixture
+def make_skill(skill_module, home):
+    """ Build initialized skills, set up to run the fake pianobar """
+    skills = []
+
+    def make(**settings):
+        skill = skill_module.create_skill()
+        skill.settings.update(email="user@example.com", password="secret",
+                              pianobar_executable=FAKE_PIANOBAR,
+                              pianobar_timeout=5, session=SESSION)
+        skill.settings.update(settings)
+        skill.initialize()
+        skills.append(skill)
+        drain(skill)
+        return skill
+
+    yield make
+    for skill in skills:
+        skill.shutdown()
+
+
+@pytest.fixture
+def skill(make_skill):
+    """ A logged-in skill that knows the fake's stations """
+    skill = make_skill()
+
+    def stations_known():
+        return len(skill.settings["stations"]) == 5
+    wait_until(stations_known)
+    skill.speak_dialog = lambda *args, **kwargs: None
+    return skill
+
+
+@pytest.fixture
+def playing(skill):
+    """ The skill playing the fake's first station """
+    skill.play_pandora(Utterance("play pandora"))
+    drain(skill)
+
+    def playing_station():
+        return skill.piano_bar_state == "playing" and \
+            skill.now_playing.title != ""
+    wait_until(playing_station)
+    return skill
+
+
+class Utterance(object):
+    """ The parts of an intent Message the handlers read """
+    def __init__(self, utterance):
+        self.data = {"utterance": utterance}
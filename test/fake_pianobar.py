@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+    A stand-in for pianobar that needs no Pandora account or audio.
+
+    It reads the same config file, shows the same prompts and screen lines,
+    takes the same single-key commands on stdin and runs event_command with
+    the same key=value payloads, so the skill can't tell the difference.
+
+    Scripted with environment variables:
+
+        FAKE_PIANOBAR_STATIONS     comma separated station names
+        FAKE_PIANOBAR_LOGIN_DELAY  seconds the login takes
+        FAKE_PIANOBAR_TUNE_DELAY   seconds fetching a playlist takes
+        FAKE_PIANOBAR_TICK         seconds between time ticker updates
+        FAKE_PIANOBAR_SONG_LENGTH  seconds each song lasts
+        FAKE_PIANOBAR_KEYLOG       file every key read is appended to
+
+    A password of "wrong" in the config fails the login.
+"""
+import os
+import subprocess
+import sys
+import threading
+import time
+
+STATIONS = os.environ.get(
+    "FAKE_PIANOBAR_STATIONS",
+    "QuickMix,Today's Hits Radio,Classic Rock Radio,Jazz Radio,"
+    "Chill Hop Radio").split(",")
+LOGIN_DELAY = float(os.environ.get("FAKE_PIANOBAR_LOGIN_DELAY", 0))
+TUNE_DELAY = float(os.environ.get("FAKE_PIANOBAR_TUNE_DELAY", 0))
+TICK = float(os.environ.get("FAKE_PIANOBAR_TICK", 1))
+SONG_LENGTH = int(os.environ.get("FAKE_PIANOBAR_SONG_LENGTH", 210))
+KEYLOG = os.environ.get("FAKE_PIANOBAR_KEYLOG")
+
+config_home = os.environ.get("XDG_CONFIG_HOME") or \
+    os.path.expanduser("~/.config")
+config = {}
+try:
+    with open(os.path.join(config_home, "pianobar", "config")) as f:
+        for line in f:
+            key, sep, value = line.partition("=")
+            if sep:
+                config[key.strip()] = value.strip()
+except (IOError, OSError):
+    pass
+
+out_lock = threading.Lock()
+busy = threading.RLock()  # held while the song or station changes
+state = {"station": None, "song": 0, "playing": False, "position": 0}
+
+
+def say(text):
+    with out_lock:
+        # Like pianobar, clear the line first
+        sys.stdout.write("\033[2K" + text)
+        sys.stdout.flush()
+
+
+def event(name, info=None):
+    command = config.get("event_command")
+    if not command:
+        return
+    payload = dict(pRet="1", pRetStr="Everything is fine :)",
+                   wRet="0", wRetStr="No error",
+                   stationCount=str(len(STATIONS)))
+    for index, station in enumerate(STATIONS):
+        payload["station" + str(index)] = station
+    payload.update(info or {})
+    stdin = "".join(key + "=" + value + "\n"
+                    for key, value in payload.items())
+    args = [command, name]
+    if command.endswith(".py"):
+        args.insert(0, sys.executable)
+    # pianobar waits for the event command before carrying on
+    subprocess.run(args, input=stdin.encode(), stdout=subprocess.DEVNULL)
+
+
+def song_info():
+    number = state["song"]
+    station = STATIONS[state["station"]]
+    return {"artist": "Artist " + str(number),
+            "title": "Song " + str(number),
+            "album": "Album " + str(number),
+            "coverArt": "http://example.com/" + str(number) + ".jpg",
+            "stationName": station, "songStationName": "",
+            "songDuration": str(SONG_LENGTH),
+            "songPlayed": str(state["position"]),
+            "rating": "0", "detailUrl": "http://example.com/"}
+
+
+def ticker():
+    remaining = SONG_LENGTH - state["position"]
+    say("#   -%02d:%02d/%02d:%02d\r" % (remaining // 60, remaining % 60,
+                                       SONG_LENGTH // 60, SONG_LENGTH % 60))
+
+
+def start_song():
+    state["song"] += 1
+    state["position"] = 0
+    info = song_info()
+    event("songstart", info)
+    say('|>  "%s" by "%s" on "%s" @ %s\n' % (
+        info["title"], info["artist"], info["album"], info["stationName"]))
+    ticker()
+
+
+def finish_song():
+    event("songfinish", song_info())
+
+
+def tune(index):
+    if index == state["station"]:
+        # pianobar only announces and fetches a station that differs
+        # from the current one
+        return
+    if state["station"] is not None:
+        finish_song()
+    state["station"] = index
+    say('|>  Station "%s" (%d)\n' % (STATIONS[index], 1000 + index))
+    say("(i) Receiving new playlist... ")
+    time.sleep(TUNE_DELAY)
+    say("Ok.\n")
+    event("stationfetchplaylist", {"stationName": STATIONS[index]})
+    state["playing"] = True
+    start_song()
+
+
+def read_key():
+    key = os.read(0, 1).decode("utf-8", "replace")
+    if KEYLOG and key:
+        with open(KEYLOG, "a") as f:
+            f.write(key)
+    return key
+
+
+def select_station():
+    for index, station in enumerate(STATIONS):
+        say("\t%2d) %s   %s\n" % (index, "q" if index == 0 else " ",
+                                   station))
+    say("[?] Select station: ")
+    digits = ""
+    while True:
+        key = read_key()
+        if not key:
+            sys.exit(0)
+        if key == "\n":
+            break
+        digits += key
+    try:
+        index = int(digits)
+    except ValueError:
+        return
+    if 0 <= index < len(STATIONS):
+        tune(index)
+
+
+def run_ticker():
+    while True:
+        time.sleep(TICK)
+        with busy:
+            if not state["playing"]:
+                continue
+            state["position"] += int(max(TICK, 1))
+            if state["position"] >= SONG_LENGTH:
+                finish_song()
+                start_song()
+            else:
+                ticker()
+
+
+def main():
+    say("Welcome to pianobar (fake)! Press ? for a list of commands.\n")
+    say("(i) Login... ")
+    time.sleep(LOGIN_DELAY)
+    if config.get("password") == "wrong":
+        say("Error: Wrong email address or password.\n")
+        event("userlogin", {"pRet": "0",
+                            "pRetStr": "Wrong email address or password."})
+        return 1
+    say("Ok.\n")
+    event("userlogin")
+    say("(i) Get stations... Ok.\n")
+    event("usergetstations")
+    select_station()
+
+    thread = threading.Thread(target=run_ticker)
+    thread.daemon = True
+    thread.start()
+    while True:
+        key = read_key()
+        if not key or key == "q":
+            return 0
+        with busy:
+            if key == "S":
+                state["playing"] = False
+            elif key == "P":
+                state["playing"] = True
+            elif key == "p":
+                state["playing"] = not state["playing"]
+            elif key == "n":
+                finish_song()
+                start_song()
+            elif key == "s":
+                select_station()
+            # anything else, e.g. the volume keys ( and ), is ignored
+
+
+if __name__ == "__main__":
+    sys.exit(main())
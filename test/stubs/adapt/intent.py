@@ -0,0 +1,23 @@
+""" Stand-in for adapt's IntentBuilder, enough to build intents """
+
+
+class IntentBuilder(object):
+    def __init__(self, intent_name):
+        self.name = intent_name
+        self.requires = []
+        self.optionals = []
+
+    def require(self, entity_type, attribute_name=None):
+        self.requires.append(entity_type)
+        return self
+
+    def optionally(self, entity_type, attribute_name=None):
+        self.optionals.append(entity_type)
+        return self
+
+    def one_of(self, *args):
+        self.requires.append(args)
+        return self
+
+    def build(self):
+        return self
@@ -0,0 +1,6 @@
+def wait_while_speaking():
+    pass
+
+
+def is_speaking():
+    return False
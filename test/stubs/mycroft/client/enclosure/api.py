@@ -0,0 +1,27 @@
+from mycroft.messagebus.message import Message
+
+
+class EnclosureAPI(object):
+    """ Sends enclosure commands as messagebus messages, like Mycroft's """
+    def __init__(self, emitter, name=""):
+        self.emitter = emitter
+        self.name = name
+
+    def _emit(self, message_type, data=None):
+        self.emitter.emit(Message(message_type, data,
+                                  {"destination": ["enclosure"]}))
+
+    def reset(self):
+        self._emit("enclosure.reset")
+
+    def mouth_reset(self):
+        self._emit("enclosure.mouth.reset")
+
+    def mouth_think(self):
+        self._emit("enclosure.mouth.think")
+
+    def mouth_text(self, text=""):
+        self._emit("enclosure.mouth.text", {"text": text})
+
+    def eyes_color(self, r=255, g=255, b=255):
+        self._emit("enclosure.eyes.color", {"r": r, "g": g, "b": b})
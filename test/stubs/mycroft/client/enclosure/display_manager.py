@@ -0,0 +1,15 @@
+""" Stand-in for Mycroft's record of which skill owns the display """
+_active = ""
+
+
+def set_active(skill_name):
+    global _active
+    _active = skill_name
+
+
+def get_active():
+    return _active
+
+
+def remove_active():
+    set_active("")
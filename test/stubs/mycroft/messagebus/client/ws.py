@@ -0,0 +1,29 @@
+from threading import Lock
+
+
+class WebsocketClient(object):
+    """ In-process messagebus that records everything emitted """
+    def __init__(self):
+        self.handlers = {}  # message type -> [handler]
+        self.sent = []      # every Message emitted, in order
+        self._lock = Lock()
+
+    def on(self, message_type, handler):
+        self.handlers.setdefault(message_type, []).append(handler)
+
+    def remove(self, message_type, handler):
+        if handler in self.handlers.get(message_type, []):
+            self.handlers[message_type].remove(handler)
+
+    def remove_all_listeners(self, message_type):
+        self.handlers.pop(message_type, None)
+
+    def emit(self, message):
+        with self._lock:
+            self.sent.append(message)
+        for handler in list(self.handlers.get(message.type, [])):
+            handler(message)
+
+    def sent_types(self, prefix=""):
+        with self._lock:
+            return [m.type for m in self.sent if m.type.startswith(prefix)]
@@ -0,0 +1,5 @@
+class Message(object):
+    def __init__(self, type, data=None, context=None):
+        self.type = type
+        self.data = data or {}
+        self.context = context or {}
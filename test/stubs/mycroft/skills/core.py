@@ -0,0 +1,90 @@
+""" Stand-in for the parts of MycroftSkill the Pandora skill uses.
+
+    Speech, intents and messagebus handlers are recorded on the skill so
+    tests can check them, and dialogs are rendered from the skill's own
+    dialog files.
+"""
+import sys
+from os.path import abspath, dirname, join, isfile
+
+from mycroft.client.enclosure.api import EnclosureAPI
+from mycroft.messagebus.client.ws import WebsocketClient
+
+
+class SkillSettings(dict):
+    def __init__(self):
+        super(SkillSettings, self).__init__()
+        self.changed_callback = None
+        self.stores = 0
+
+    def set_changed_callback(self, callback):
+        self.changed_callback = callback
+
+    def store(self, force=False):
+        self.stores += 1
+
+
+def intent_handler(intent_parser):
+    def decorator(func):
+        func.intent_parser = intent_parser
+        return func
+    return decorator
+
+
+class MycroftSkill(object):
+    def __init__(self, name=None, emitter=None):
+        self.name = name or self.__class__.__name__
+        self.lang = "en-us"
+        self.settings = SkillSettings()
+        self.config_core = {"enclosure": {}}
+        self._dir = dirname(abspath(sys.modules[self.__module__].__file__))
+        self.emitter = emitter or WebsocketClient()
+        self.enclosure = EnclosureAPI(self.emitter, self.name)
+        self.events = []     # (message type, handler) added with add_event
+        self.intents = []    # (intent, handler) registered
+        self.spoken = []     # everything said, dialogs rendered
+        self.responses = []  # answers get_response() hands out in turn
+
+    def register_intent(self, intent_parser, handler):
+        self.intents.append((intent_parser, handler))
+
+    def add_event(self, name, handler, handler_info=None):
+        self.events.append((name, handler))
+        self.emitter.on(name, handler)
+
+    def remove_event(self, name):
+        for event in [e for e in self.events if e[0] == name]:
+            self.events.remove(event)
+            self.emitter.remove(name, event[1])
+
+    def _dialog_lines(self, name, ext):
+        path = join(self._dir, "dialog", self.lang, name + ext)
+        if not isfile(path):
+            return []
+        with open(path) as f:
+            return [line.strip() for line in f if line.strip()]
+
+    def translate(self, text, data=None):
+        lines = self._dialog_lines(text, ".dialog") or [text]
+        line = lines[0]
+        for key, value in (data or {}).items():
+            line = line.replace("{{" + key + "}}", str(value))
+            line = line.replace("{" + key + "}", str(value))
+        return line
+
+    def translate_list(self, list_name, data=None):
+        return self._dialog_lines(list_name, ".list")
+
+    def speak(self, utterance, expect_response=False):
+        self.spoken.append(utterance)
+
+    def speak_dialog(self, key, data=None, expect_response=False):
+        self.speak(self.translate(key, data), expect_response)
+
+    def get_response(self, dialog="", data=None, validator=None,
+                     on_fail=None, num_retries=-1):
+        self.speak_dialog(dialog, data, expect_response=True)
+        return self.responses.pop(0) if self.responses else None
+
+    def shutdown(self):
+        pass
@@ -0,0 +1,87 @@
+"""
+    Latency of the skill's hot paths against the fake pianobar.
+
+    Run with "pytest test/test_benchmarks.py" to see the timings, and
+    --benchmark-autosave / --benchmark-compare to catch regressions.
+"""
+import itertools
+import os
+import subprocess
+import sys
+
+from conftest import EVENT_COMMAND, Utterance, drain, wait_until
+
+
+def test_play_pandora_handler(benchmark, skill):
+    # Only the handler: the station change itself is queued on the worker
+    benchmark(skill.play_pandora, Utterance("play classic rock"))
+    drain(skill)
+    assert skill.piano_bar_state == "playing"
+
+
+def test_play_station(benchmark, playing):
+    names = itertools.cycle(["Jazz ", "Classic Rock ", "Chill Hop "])
+
+    def play():
+        name = next(names)
+        playing._play_station(name)
+        return name
+    benchmark.pedantic(play, rounds=30, warmup_rounds=2)
+    assert playing.piano_bar_state == "playing"
+
+
+def test_next_station_until_it_plays(benchmark, playing):
+    def next_station():
+        station = playing.current_station
+        playing.handle_next_station()
+
+        def tuned():
+            return playing.current_station != station
+        wait_until(tuned)
+        drain(playing)
+    benchmark.pedantic(next_station, rounds=30, warmup_rounds=2)
+
+
+def test_extract_station(benchmark, skill):
+    def extract():
+        skill.station_index.clear_cache()
+        return skill._extract_station("play classic rok on pandora")
+    assert benchmark(extract) == "Classic Rock "
+
+
+def test_extract_station_repeated(benchmark, skill):
+    extract = skill._extract_station
+    assert benchmark(extract, "play jazz") == "Jazz "
+
+
+def test_track_update(benchmark, playing):
+    seq = itertools.count(playing._info_seq + 1)
+    info = dict(("station" + str(n), name)
+                for n, name in enumerate(playing.station_list.names))
+    info.update(stationCount=str(len(playing.station_list.names)),
+                artist="Artist", album="Album", stationName="Jazz Radio")
+
+    def songstart():
+        number = next(seq)
+        playing._handle_pianobar_event(
+            "songstart", dict(info, title="Song " + str(number)), number)
+    benchmark(songstart)
+    assert playing.now_playing.title.startswith("Song ")
+
+
+def test_track_update_from_the_hook(benchmark, playing):
+    env = dict(os.environ, XDG_CONFIG_HOME=playing.pianobar.config_home,
+               PIANOBAR_SESSION=playing.pianobar.session)
+    titles = ("Song " + str(n) for n in itertools.count())
+
+    def songstart():
+        title = next(titles)
+        subprocess.run([sys.executable, EVENT_COMMAND, "songstart"],
+                       input=("artist=Artist\ntitle=" + title +
+                              "\nstationName=Jazz Radio\n").encode(),
+                       env=env)
+
+        def shown():
+            return playing.now_playing.title == title
+        wait_until(shown)
+    benchmark.pedantic(songstart, rounds=20, warmup_rounds=2)
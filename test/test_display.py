@@ -0,0 +1,119 @@
+import time
+
+from conftest import drain, wait_until
+
+
+class RecordingEnclosure(object):
+    def __init__(self):
+        self.messages = []  # (time, method, args)
+
+    def __getattr__(self, name):
+        def record(*args):
+            self.messages.append((time.time(), name) + args)
+        return record
+
+
+def next_song(skill):
+    title = skill.now_playing.title
+    skill.handle_next_song()
+
+    def new_song():
+        return skill.now_playing.title != title
+    wait_until(new_song)
+
+
+def enclosure_messages(skill):
+    return skill.emitter.sent_types("enclosure.")
+
+
+def test_one_message_per_track_change(playing):
+    time.sleep(0.6)
+    del playing.emitter.sent[:]
+    changes = 5
+    for _ in range(changes):
+        next_song(playing)
+        time.sleep(0.6)  # longer than the display's min_interval
+    messages = enclosure_messages(playing)
+    print("{} enclosure messages for {} track changes".format(
+        len(messages), changes))
+    # mouth_think and mouth_text, or just the text when the new song
+    # arrives within the debounce time
+    assert changes <= len(messages) <= 2 * changes
+    assert messages[-1] == "enclosure.mouth.text"
+    assert playing.emitter.sent[-1].data["text"] == \
+        playing.now_playing.artist + ": " + playing.now_playing.title
+
+
+def test_skipping_quickly_sends_little(playing):
+    time.sleep(0.6)
+    del playing.emitter.sent[:]
+    for _ in range(10):
+        next_song(playing)
+    time.sleep(0.6)
+    messages = enclosure_messages(playing)
+    print("{} enclosure messages for 10 quick skips".format(len(messages)))
+    assert len(messages) <= 4
+    assert playing.emitter.sent[-1].data["text"].endswith(
+        playing.now_playing.title)
+
+
+def test_same_song_is_not_sent_again(playing):
+    time.sleep(0.6)
+    del playing.emitter.sent[:]
+    for _ in range(5):
+        playing._show_now_playing()
+    time.sleep(0.6)
+    assert enclosure_messages(playing) == []
+
+
+def test_stop_resets_the_mouth(playing):
+    playing.stop()
+    playing.display.flush()
+    drain(playing)
+    assert enclosure_messages(playing)[-1] == "enclosure.mouth.reset"
+
+
+def test_updates_are_spaced_out(skill_module):
+    enclosure = RecordingEnclosure()
+    display = skill_module.EnclosureDisplay(enclosure, debounce=0.01,
+                                            min_interval=0.1)
+    for number in range(20):
+        display.song("Artist", "Song " + str(number))
+        time.sleep(0.02)
+    time.sleep(0.2)
+    times = [message[0] for message in enclosure.messages]
+    assert len(times) < 20
+    assert all(later - earlier >= 0.09
+               for earlier, later in zip(times, times[1:]))
+    assert enclosure.messages[-1][1:] == ("mouth_text", "Artist: Song 19")
+
+
+def test_long_titles_are_cut_once_per_track(skill_module):
+    enclosure = RecordingEnclosure()
+    display = skill_module.EnclosureDisplay(enclosure, debounce=0,
+                                            min_interval=0)
+    title = "An Extremely Long Song Title That Would Take Ages To Scroll"
+    display.song("Artist", title)
+    display.flush()
+    text = enclosure.messages[-1][2]
+    assert len(text) <= display.max_chars
+    assert text == "Artist: An Extremely Long Song Title..."
+    shortened = display._track
+    display.song("Artist", title)
+    assert display._track is shortened
+
+
+def test_the_song_that_started_is_shown(playing):
+    seq = playing._info_seq
+    info = {"artist": "Artist", "album": "Album",
+            "stationName": playing.station_list.names[0] + "Radio"}
+    playing._handle_pianobar_event(
+        "songfinish", dict(info, title="Finished Song"), seq + 1)
+    playing.display.flush()
+    assert "Finished Song" not in playing.emitter.sent[-1].data.get(
+        "text", "")
+
+    playing._handle_pianobar_event(
+        "songstart", dict(info, title="New Song"), seq + 2)
+    playing.display.flush()
+    assert playing.emitter.sent[-1].data["text"] == "Artist: New Song"
@@ -0,0 +1,158 @@
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from conftest import EVENT_COMMAND, session_home, wait_until
+
+STRESS_CYCLES = int(os.environ.get("PIANOBAR_STRESS_CYCLES", 2000))
+
+
+def run_hook(event, info, config_home, *args, **env):
+    stdin = "".join(key + "=" + value + "\n" for key, value in info.items())
+    return subprocess.run(
+        [sys.executable] + list(args) + [EVENT_COMMAND, event],
+        input=stdin.encode(), stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        env=dict(os.environ, XDG_CONFIG_HOME=str(config_home), **env))
+
+
+def test_info_handoff_survives_concurrent_writers(skill_module, home):
+    config_home = session_home(home)
+    info_path = config_home / "pianobar" / "info"
+    stats = {"reads": 0, "partial": 0, "missing": 0, "errors": 0,
+             "backwards": 0}
+    done = threading.Event()
+
+    skill = skill_module.create_skill()
+    skill.pianobar_path = str(config_home / "pianobar")
+
+    def read_raw():
+        while not done.is_set():
+            try:
+                with open(str(info_path)) as f:
+                    data = json.load(f)
+                assert data["info"]["artist"].startswith("Artist")
+                stats["reads"] += 1
+            except (IOError, OSError):
+                stats["missing"] += 1
+            except (ValueError, KeyError, AssertionError):
+                stats["partial"] += 1
+
+    def read_with_skill():
+        seq = 0
+        while not done.is_set():
+            try:
+                skill._load_current_info()
+            except Exception:
+                stats["errors"] += 1
+            if skill._info_seq < seq:
+                stats["backwards"] += 1
+            seq = skill._info_seq
+
+    readers = [threading.Thread(target=read_raw),
+               threading.Thread(target=read_with_skill)]
+    for reader in readers:
+        reader.start()
+
+    def write(number):
+        # Big enough that a plain write would take several syscalls
+        run_hook("songstart", {"artist": "Artist " + str(number),
+                               "title": "Song", "album": "Album",
+                               "pad": "x" * 20000}, config_home)
+    try:
+        with ThreadPoolExecutor(16) as pool:
+            list(pool.map(write, range(STRESS_CYCLES)))
+    finally:
+        done.set()
+        for reader in readers:
+            reader.join()
+
+    print(stats)
+    assert stats["reads"] > 0
+    assert stats["partial"] == 0
+    assert stats["errors"] == 0
+    assert stats["backwards"] == 0
+    # No temporary files are left behind
+    assert sorted(os.listdir(str(config_home / "pianobar"))) == \
+        ["info", "tls_fingerprint"]
+    # Concurrent hooks may rename out of order, pianobar itself runs them
+    # one at a time; an older file must not replace what the skill shows
+    with open(str(info_path)) as f:
+        data = json.load(f)
+    seq = skill._info_seq
+    skill._load_current_info()
+    assert skill._info_seq == max(seq, data["seq"])
+
+
+def test_reader_tolerates_bad_info_files(skill_module, home):
+    skill = skill_module.create_skill()
+    skill.pianobar_path = str(session_home(home) / "pianobar")
+    info_path = session_home(home) / "pianobar" / "info"
+    for content in ("", "{", '{"seq": 1, "info": {"artist": "A"', "[]"):
+        info_path.write_text(content)
+        skill._load_current_info()
+    info_path.unlink()
+    skill._load_current_info()
+    assert skill.now_playing.artist == ""
+
+
+def test_every_event_is_forwarded(skill_module, home):
+    config_home = session_home(home)
+    received = []
+    listener = skill_module.PianobarEventListener(
+        str(config_home / "pianobar" / "event_socket"),
+        lambda *args: received.append(args), "kitchen")
+    listener.start()
+    events = ["userlogin", "usergetstations", "stationfetchplaylist",
+              "songstart", "songlove", "songban", "songfinish",
+              "stationcreate", "stationdelete", "stationrename"]
+    try:
+        for event in events:
+            run_hook(event, {"pRet": "1", "stationCount": "1",
+                             "station0": "Jazz Radio", "title": "Ünïcode"},
+                     config_home, PIANOBAR_SESSION="kitchen",
+                     PIANOBAR_INSTANCE="a")
+        # Another session's events are not for this listener
+        run_hook("songstart", {}, config_home, PIANOBAR_SESSION="den")
+
+        def all_received():
+            return len(received) >= len(events)
+        wait_until(all_received)
+        time.sleep(0.1)
+    finally:
+        listener.stop()
+
+    assert [args[0] for args in received] == events
+    for event, info, seq, instance in received:
+        assert info == {"pRet": "1", "stationCount": "1",
+                        "station0": "Jazz Radio", "title": "Ünïcode"}
+        assert seq > 0
+        assert instance == "a"
+    seqs = [args[2] for args in received]
+    assert seqs == sorted(seqs)
+
+
+def test_hook_imports_only_what_it_needs(home):
+    result = run_hook("songstart", {"artist": "A"}, session_home(home),
+                      "-X", "importtime")
+    modules = [line.split("|")[-1].strip()
+               for line in result.stderr.decode().splitlines()
+               if line.startswith("import time:")]
+    own = modules[modules.index("site") + 1:]
+    print("imported by event_command.py: " + ", ".join(own))
+    assert not set(own) & {"json", "shutil", "threading", "socket", "re",
+                           "enum", "selectors", "subprocess"}
+
+
+def test_hook_startup_benchmark(benchmark, home):
+    info = {"artist": "Artist", "title": "Song", "album": "Album",
+            "stationName": "Jazz Radio", "stationCount": "1",
+            "station0": "Jazz Radio"}
+    result = benchmark.pedantic(run_hook, ("songstart", info,
+                                           session_home(home)),
+                                rounds=20, warmup_rounds=2)
+    assert result.returncode == 0
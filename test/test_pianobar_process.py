@@ -0,0 +1,143 @@
+import os
+import signal
+import time
+
+from conftest import drain, wait_until
+
+
+def test_station_switch_keeps_one_process(playing):
+    pid = playing.process.pid
+    launch = playing.pianobar.started_at
+    timings = []
+    for index in (2, 3, 1, 4, 2):
+        started = time.time()
+        playing.worker.submit('play', playing._change_station, index)
+
+        def new_station_playing():
+            return playing.now_playing.station_name == \
+                playing.station_list.names[index]
+        wait_until(new_station_playing)
+        timings.append(time.time() - started)
+
+    assert playing.process.pid == pid
+    assert playing.pianobar.started_at == launch
+    timings.sort()
+    print("station switch: median {:.1f} ms, worst {:.1f} ms".format(
+        timings[len(timings) // 2] * 1000, timings[-1] * 1000))
+    # With no network in the way this is bounded by the event hook
+    assert timings[-1] < 1.0
+
+
+def test_station_switch_is_quicker_than_a_relaunch(playing):
+    started = time.time()
+    playing.worker.submit('play', playing._change_station, 3)
+    drain(playing)
+    switch = time.time() - started
+
+    playing.pianobar.stop()
+    started = time.time()
+    playing._launch_pianobar_process()
+    relaunch = time.time() - started
+    assert playing.process
+    assert switch < relaunch
+
+
+def test_commands_in_a_burst_keep_the_prompt_intact(playing, tmp_path,
+                                                     monkeypatch):
+    keylog = tmp_path / "keys"
+    monkeypatch.setenv("FAKE_PIANOBAR_KEYLOG", str(keylog))
+    playing.pianobar.stop()
+    playing._launch_pianobar_process()
+    for index in (1, 2, 3, 4):
+        # Only the last of these is still waiting when the worker gets
+        # to it, and the station number can't be split by other keys
+        playing.worker.submit('play', playing._change_station, index)
+        playing.worker.submit('next_song', playing.cmd, "n")
+    drain(playing)
+    keys = keylog.read_text()
+    assert keys.startswith("0\nS")
+    assert "s4\n" in keys
+
+
+def test_choosing_the_station_already_tuned_in_doesnt_wait(skill):
+    skill.worker.submit('play', skill._launch_pianobar_process)
+    drain(skill)
+    assert skill.piano_bar_state == "paused"
+    first = skill.settings["stations"][0][0]
+    for _ in range(2):
+        started = time.time()
+        skill.worker.submit('play', skill._play_station, first)
+        drain(skill)
+        # Well under pianobar_timeout, pianobar prints no station line
+        assert time.time() - started < 1
+        assert skill.piano_bar_state == "playing"
+        assert skill.pianobar.station == 0
+    # The song is shown again in place of the thinking animation
+    skill.display.flush()
+    assert skill.emitter.sent_types("enclosure.")[-1] == \
+        "enclosure.mouth.text"
+
+    position = skill.pianobar.position
+
+    def moving():
+        return skill.pianobar.position != position
+    wait_until(moving)
+
+
+def test_watchdog_restarts_on_the_same_station(playing, monkeypatch):
+    monkeypatch.setattr(playing, "WATCHDOG_BACKOFF", (0.1, 1))
+    playing.metrics.enabled = True
+    playing.worker.submit('play', playing._play_station, "Jazz ")
+    drain(playing)
+    pid = playing.process.pid
+
+    os.kill(pid, signal.SIGKILL)
+
+    def recovered():
+        return playing.piano_bar_state == "playing" and \
+            playing.process is not None and playing.process.pid != pid
+    wait_until(recovered)
+    assert playing.current_station == "3"
+    assert playing.metrics.snapshot()["counters"][
+        "watchdog_restarts_total"] == 1
+
+
+def test_command_to_a_dead_pianobar_recovers_it(playing, monkeypatch):
+    monkeypatch.setattr(playing, "WATCHDOG_BACKOFF", (30, 60))
+    playing.worker.submit('play', playing._play_station, "Classic Rock ")
+    drain(playing)
+    process = playing.pianobar.process
+    process.kill()
+    process.wait()
+
+    playing.worker.submit('next_song', playing.cmd, "n")
+    drain(playing)
+    assert playing.process is not None
+    assert playing.piano_bar_state == "playing"
+    assert playing.current_station == "2"
+    assert playing._watchdog_timer is None
+
+
+def test_exit_reason_reads_the_last_lines(skill_module):
+    pianobar = skill_module.PianobarProcess()
+    cases = [
+        ("(i) Login... Error: Network error.\n", "network"),
+        ("(i) Login... Error: Wrong email address or password.\n", "login"),
+        ("(i) Login... Error: Invalid username and/or password\n" +
+         "#   -01:00/02:00\r" * 10 + "/!\\ Network error: Timeout.\n",
+         "network"),
+        ("/!\\ TLS fingerprint mismatch\n", "tls"),
+        ("|>  Station \"Jazz\" (1)\n", "unknown"),
+    ]
+    for output, reason in cases:
+        pianobar._output = output
+        assert pianobar.exit_reason() == reason, output
+
+
+def test_wrong_password_is_reported(make_skill):
+    skill = make_skill(password="wrong")
+    skill.worker.submit('play', skill._launch_pianobar_process)
+    drain(skill)
+    assert skill.process is None
+    assert skill.piano_bar_state == "error"
+    assert skill.spoken[-1] == skill.translate("wrong.credentials")
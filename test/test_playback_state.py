@@ -0,0 +1,129 @@
+import time
+
+from mycroft.messagebus.message import Message
+
+from conftest import Utterance, drain, wait_until
+
+
+def test_handler_count_stays_flat_over_pause_resume_cycles(playing):
+    before = playing.registered_handlers
+    listeners = len(playing.events)
+    for _ in range(10000):
+        playing.handle_pause()
+        drain(playing)
+        playing.handle_resume_song()
+        drain(playing)
+    assert playing.piano_bar_state == "playing"
+    assert playing.registered_handlers == before
+    assert len(playing.events) == listeners
+    assert len(playing.emitter.handlers[
+        'recognizer_loop:record_begin']) == 1
+
+
+def test_wake_word_handler_only_while_playing(playing):
+    playing.handle_pause()
+    drain(playing)
+    assert playing.piano_bar_state == "paused"
+    # Still subscribed; it is dropped when playback stops for good
+    assert 'recognizer_loop:record_begin' in playing._subscriptions
+    playing.shutdown()
+    assert playing.piano_bar_state == "idle"
+    assert 'recognizer_loop:record_begin' not in playing._subscriptions
+
+
+def test_invalid_transition_is_ignored(skill):
+    assert skill.piano_bar_state == "idle"
+    skill.piano_bar_state = "playing"
+    assert skill.piano_bar_state == "idle"
+
+
+def test_pause_queued_behind_play_wins(skill):
+    skill.play_pandora(Utterance("play jazz"))
+    skill.handle_pause()
+    drain(skill)
+    assert skill.piano_bar_state == "paused"
+
+    # The wake word must not "resume" what the user paused
+    skill.handle_listener_started(None)
+    skill._end_auto_duck()
+    drain(skill)
+    assert skill.piano_bar_state == "paused"
+
+
+def test_pause_before_pianobar_runs_is_kept(skill):
+    assert skill.process is None
+    skill.play_pandora(Utterance("play classic rock"))
+    skill.handle_pause()
+    drain(skill)
+    assert skill.process is not None
+    assert skill.piano_bar_state == "paused"
+
+
+def test_auto_duck_waits_for_the_answer(playing):
+    playing.settings["duck_grace"] = 0.2
+    bus = playing.emitter
+
+    bus.emit(Message('recognizer_loop:record_begin'))
+    drain(playing)
+    assert playing.piano_bar_state == "autopause"
+
+    # Speech-to-text and intent handling take longer than duck_grace
+    bus.emit(Message('recognizer_loop:record_end'))
+    time.sleep(0.05)
+    bus.emit(Message('recognizer_loop:utterance'))
+    bus.emit(Message('mycroft.skill.handler.start'))
+    time.sleep(0.4)
+    assert playing.piano_bar_state == "autopause"
+
+    bus.emit(Message('recognizer_loop:audio_output_start'))
+    bus.emit(Message('mycroft.skill.handler.complete'))
+    time.sleep(0.05)
+    bus.emit(Message('recognizer_loop:audio_output_end'))
+
+    def resumed():
+        return playing.piano_bar_state == "playing"
+    wait_until(resumed, timeout=2)
+
+
+def test_follow_up_question_keeps_the_music_down(playing):
+    playing.settings["duck_grace"] = 0.2
+    bus = playing.emitter
+
+    # "Hey Mycroft, play something", answered with a question
+    for event in ('record_begin', 'record_end', 'utterance'):
+        bus.emit(Message('recognizer_loop:' + event))
+    bus.emit(Message('mycroft.skill.handler.start'))
+    bus.emit(Message('recognizer_loop:audio_output_start'))
+    bus.emit(Message('recognizer_loop:audio_output_end'))
+    # and Mycroft listens for the answer
+    bus.emit(Message('recognizer_loop:record_begin'))
+    time.sleep(0.4)
+    drain(playing)
+    assert playing.piano_bar_state == "autopause"
+
+    bus.emit(Message('recognizer_loop:record_end'))
+    bus.emit(Message('mycroft.skill.handler.complete'))
+
+    def resumed():
+        return playing.piano_bar_state == "playing"
+    wait_until(resumed, timeout=2)
+
+
+def test_volume_duck_turns_down_and_back_up(playing, tmp_path,
+                                            monkeypatch):
+    keylog = tmp_path / "keys"
+    monkeypatch.setenv("FAKE_PIANOBAR_KEYLOG", str(keylog))
+    playing.pianobar.stop()
+    playing._launch_pianobar_process()
+    playing._resume()
+    playing.settings.update(duck_mode="volume", duck_volume_steps=3,
+                            duck_grace=0.1)
+
+    playing.emitter.emit(Message('recognizer_loop:record_begin'))
+    playing.emitter.emit(Message('recognizer_loop:audio_output_end'))
+
+    def resumed():
+        return playing.piano_bar_state == "playing"
+    wait_until(resumed, timeout=2)
+    drain(playing)
+    assert keylog.read_text().endswith("P(((" + ")))")
@@ -0,0 +1,66 @@
+import hashlib
+import os
+import shutil
+import subprocess
+from types import SimpleNamespace
+
+import pytest
+
+
+def write_pid(config_home, name, pid):
+    pianobar_path = config_home / "pianobar"
+    pianobar_path.mkdir(parents=True, exist_ok=True)
+    (pianobar_path / (name + ".pid")).write_text(str(pid))
+
+
+def test_kill_orphans_leaves_other_sessions_alone(skill_module, tmp_path):
+    sleep = shutil.which("sleep")
+    if not sleep:
+        pytest.skip("no sleep command to stand in for pianobar")
+    pianobar = str(tmp_path / "pianobar")
+    shutil.copy(sleep, pianobar)
+    kitchen = tmp_path / "kitchen"
+    den = tmp_path / "den"
+    orphan = subprocess.Popen([pianobar, "60"])
+    others = subprocess.Popen([pianobar, "60"])
+    not_pianobar = subprocess.Popen([sleep, "60"])
+    try:
+        write_pid(kitchen, "main", orphan.pid)
+        write_pid(kitchen, "a", not_pianobar.pid)
+        write_pid(den, "main", others.pid)
+
+        skill_module.PianobarProcess.kill_orphans(str(kitchen))
+
+        assert orphan.wait(5) != 0
+        assert others.poll() is None
+        assert not_pianobar.poll() is None
+        assert os.listdir(str(kitchen / "pianobar")) == []
+        assert os.listdir(str(den / "pianobar")) == ["main.pid"]
+    finally:
+        for process in (orphan, others, not_pianobar):
+            process.kill()
+            process.wait()
+
+
+def test_each_device_gets_its_own_session(skill_module, home, monkeypatch):
+    skills = []
+    for uuid in ("1111-aaaa", "2222-bbbb"):
+        identity = SimpleNamespace(uuid=uuid)
+        monkeypatch.setattr(skill_module, "IdentityManager",
+                            SimpleNamespace(get=lambda: identity))
+        skill = skill_module.create_skill()
+        skill._use_session(skill._default_session())
+        skills.append(skill)
+    kitchen, den = skills
+    assert kitchen.pianobar.session == \
+        "device-" + hashlib.sha1(b"1111-aaaa").hexdigest()[:12]
+    assert kitchen.pianobar_path != den.pianobar_path
+    assert kitchen.pianobar.pid_path != den.pianobar.pid_path
+    assert kitchen.history.log_path != den.history.log_path
+
+    # Before pairing, the skill's directory is used
+    monkeypatch.setattr(skill_module, "IdentityManager", None)
+    assert kitchen._default_session().startswith("skill-")
+    assert kitchen._default_session() == den._default_session()
+    for skill in skills:
+        skill.shutdown()
@@ -0,0 +1,171 @@
+import functools
+import hashlib
+import json
+import os
+import shutil
+import socket
+import ssl
+import subprocess
+import threading
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from conftest import SESSION, Utterance, drain, session_home, wait_until
+
+
+def no_network():
+    raise OSError("Network is unreachable")
+
+
+def test_setup_is_retried_after_a_failure(skill_module, home, make_skill,
+                                          monkeypatch):
+    # No fingerprint cached yet, and no network at boot
+    (session_home(home) / "pianobar" / "tls_fingerprint").unlink()
+    monkeypatch.setattr(skill_module, "fetch_tls_fingerprint", no_network)
+    skill = make_skill()
+    assert skill._is_setup
+    assert not skill._prepared
+    # Songs are still reported once pianobar does run
+    assert skill.event_listener is not None
+
+    monkeypatch.setattr(skill_module, "fetch_tls_fingerprint",
+                        lambda *args: "0" * 40)
+    skill.on_websettings_changed()
+    drain(skill)
+    assert skill._prepared
+    assert (session_home(home) / "pianobar" / "config").exists()
+
+
+def test_play_request_finishes_a_failed_setup(skill_module, home, make_skill,
+                                              monkeypatch):
+    (session_home(home) / "pianobar" / "tls_fingerprint").unlink()
+    monkeypatch.setattr(skill_module, "fetch_tls_fingerprint", no_network)
+    skill = make_skill()
+    skill.speak_dialog = lambda *args, **kwargs: None
+    monkeypatch.setattr(skill_module, "fetch_tls_fingerprint",
+                        lambda *args: "0" * 40)
+
+    skill.play_pandora(Utterance("play pandora"))
+    drain(skill)
+    assert skill._prepared
+
+    def playing():
+        return skill.piano_bar_state == "playing" and \
+            skill.now_playing.title != ""
+    wait_until(playing)
+    assert len(skill.settings["stations"]) == 5
+
+
+@pytest.fixture
+def tls_server(tmp_path):
+    """ A local stand-in for tuner.pandora.com with a fresh certificate """
+    openssl = shutil.which("openssl")
+    if not openssl:
+        pytest.skip("openssl isn't installed")
+    key, cert = str(tmp_path / "key.pem"), str(tmp_path / "cert.pem")
+    subprocess.run([openssl, "req", "-x509", "-newkey", "rsa:2048",
+                    "-nodes", "-keyout", key, "-out", cert, "-days", "1",
+                    "-subj", "/CN=localhost"],
+                   check=True, stdout=subprocess.PIPE,
+                   stderr=subprocess.PIPE)
+    context = ssl.SSLContext(ssl.PROTOCOL_TLS_SERVER)
+    context.load_cert_chain(cert, key)
+    listener = socket.socket()
+    listener.bind(("127.0.0.1", 0))
+    listener.listen(5)
+    server = SimpleNamespace(port=listener.getsockname()[1], cert=cert,
+                             connections=0)
+
+    def serve():
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except OSError:
+                return  # closed
+            server.connections += 1
+            try:
+                with context.wrap_socket(conn, server_side=True):
+                    pass
+            except (ssl.SSLError, OSError):
+                pass
+    thread = threading.Thread(target=serve)
+    thread.daemon = True
+    thread.start()
+    yield server
+    listener.close()
+
+
+@pytest.fixture
+def tls_skill(skill_module, home, tls_server, monkeypatch):
+    """ A skill that fetches the fingerprint from tls_server """
+    monkeypatch.setattr(skill_module, "fetch_tls_fingerprint",
+                        functools.partial(skill_module.fetch_tls_fingerprint,
+                                          "127.0.0.1", tls_server.port))
+    (session_home(home) / "pianobar" / "tls_fingerprint").unlink()
+    skill = skill_module.create_skill()
+    skill._use_session(SESSION)
+    skill.settings.update(email="user@example.com", password="secret")
+    yield skill
+    skill.shutdown()
+
+
+def test_fingerprint_is_the_certificates_sha1(skill_module, tls_server):
+    fingerprint = skill_module.fetch_tls_fingerprint("127.0.0.1",
+                                                     tls_server.port)
+    with open(tls_server.cert) as f:
+        der = ssl.PEM_cert_to_DER_cert(f.read())
+    assert fingerprint == hashlib.sha1(der).hexdigest().upper()
+    # The same as the openssl pipeline the skill used to run
+    result = subprocess.run(["openssl", "x509", "-noout", "-fingerprint",
+                             "-sha1", "-in", tls_server.cert],
+                            stdout=subprocess.PIPE, check=True)
+    openssl = result.stdout.decode().strip().split("=")[1]
+    assert fingerprint == openssl.replace(":", "")
+
+
+def test_fingerprint_is_cached_until_the_ttl(tls_skill, tls_server):
+    fingerprint = tls_skill._tls_fingerprint()
+    assert tls_skill._tls_fingerprint() == fingerprint
+    assert tls_server.connections == 1
+
+    tls_skill.settings["tls_fingerprint_ttl"] = 0
+    assert tls_skill._tls_fingerprint() == fingerprint
+    assert tls_server.connections == 2
+
+
+def test_config_is_only_rewritten_when_it_changes(tls_skill, tls_server):
+    config_path = os.path.join(tls_skill.pianobar_path, "config")
+    tls_skill._configure_pianobar()
+    with open(config_path) as f:
+        assert "tls_fingerprint = " + tls_skill._tls_fingerprint() in \
+            f.read()
+    an_hour_ago = time.time() - 3600
+    os.utime(config_path, (an_hour_ago, an_hour_ago))
+
+    tls_skill._configure_pianobar()
+    assert os.path.getmtime(config_path) == an_hour_ago
+
+    tls_skill.settings["password"] = "new secret"
+    tls_skill._configure_pianobar()
+    assert os.path.getmtime(config_path) > an_hour_ago
+    assert tls_server.connections == 1
+
+
+def test_tls_failure_refreshes_the_fingerprint(tls_skill, tls_server):
+    cache_path = os.path.join(tls_skill.pianobar_path, "tls_fingerprint")
+    with open(cache_path, "w") as f:
+        json.dump({"fingerprint": "0" * 40, "fetched": time.time()}, f)
+    tls_skill._configure_pianobar()
+    # A login that failed on an outdated fingerprint
+    tls_skill.pianobar._output = "(i) Login... Error: TLS fingerprint " \
+        "mismatch.\n"
+    assert tls_skill._refresh_tls_after_failure()
+    with open(os.path.join(tls_skill.pianobar_path, "config")) as f:
+        assert "tls_fingerprint = " + "0" * 40 not in f.read()
+    assert tls_server.connections == 1
+
+    # Nothing to refresh when the login failed for another reason
+    tls_skill.pianobar._output = "Error: Wrong email address or password."
+    assert not tls_skill._refresh_tls_after_failure()
@@ -0,0 +1,81 @@
+import time
+
+import pytest
+
+from conftest import drain, wait_until
+
+
+@pytest.fixture
+def standby_skill(playing):
+    playing.settings["warm_standby"] = True
+    return playing
+
+
+def station(skill, index):
+    return skill.settings["stations"][index][0]
+
+
+def wait_for_standby(skill, index):
+    def standby_ready():
+        return skill._standby_thread is None and \
+            skill.standby is not None and skill.standby.running and \
+            skill._standby_index == index
+    wait_until(standby_ready)
+
+
+def switch(skill, index):
+    """ Play station index, returning how long until its song showed """
+    started = time.time()
+    skill.worker.submit('play', skill._play_station, station(skill, index))
+
+    def new_station_playing():
+        return skill.now_playing.station_name == \
+            skill.station_list.names[index]
+    wait_until(new_station_playing)
+    return time.time() - started
+
+
+def test_next_station_warms_the_one_after(standby_skill):
+    skill = standby_skill
+    for _ in range(5):
+        skill.history.record(station(skill, 4), 200)
+    switch(skill, 1)
+    wait_for_standby(skill, 4)  # the favourite
+
+    skill.handle_next_station()
+    drain(skill)
+    assert skill.current_station == "2"
+    wait_for_standby(skill, 3)
+
+
+def test_prediction_made_while_warming_up_is_used(standby_skill,
+                                                   monkeypatch):
+    skill = standby_skill
+    monkeypatch.setenv("FAKE_PIANOBAR_LOGIN_DELAY", "0.5")
+    switch(skill, 1)  # starts warming up station 2
+    switch(skill, 2)  # before that is ready
+    wait_for_standby(skill, 3)
+    assert skill.standby.station == 3
+
+
+def test_swap_is_quicker_than_a_switch(standby_skill, monkeypatch):
+    skill = standby_skill
+    # Give fetching a playlist the time it takes over the network
+    monkeypatch.setenv("FAKE_PIANOBAR_TUNE_DELAY", "0.3")
+    skill.pianobar.stop()
+    skill._launch_pianobar_process()
+    skill._resume()
+
+    normal = switch(skill, 1)
+    wait_for_standby(skill, 2)
+    main_rss = skill._rss_kb(skill.pianobar)
+    standby_rss = skill._rss_kb(skill.standby)
+    pid = skill.standby.process.pid
+    swap = switch(skill, 2)
+
+    assert skill.process.pid == pid
+    print("switch {:.0f} ms, swap to the standby {:.0f} ms; "
+          "main {} kB, standby {} kB RSS".format(
+              normal * 1000, swap * 1000, main_rss, standby_rss))
+    assert swap < normal
+    assert standby_rss
@@ -0,0 +1,157 @@
+import random
+
+import pytest
+from fuzzywuzzy import fuzz, process as fuzz_process
+
+VOCABS = ["change", "switch", "play", "skip", "next", "on", "pandora",
+          "pandora's", "pianobar", "piano bar", "start", "list", "what",
+          "song", "track", "tune", "stations", "station", "channel",
+          "channels", "radio"]
+COMMON_WORDS = ["to", "on", "pandora", "play"]
+
+# Station names as the skill stores them ("Radio" removed), and what
+# speech-to-text made of a request for each
+STATIONS = ["Today's Hits ", "Beyoncé ", "Kendrick Lamar ", "Chill Hop ",
+            "Yo-Yo Ma ", "Tchaikovsky ", "Classic Rock ", "Metallica ",
+            "Nirvana ", "Lo-Fi Beats ", "Phish ", "Ed Sheeran ",
+            "Thelonious Monk ", "Hozier ", "Imagine Dragons "]
+CORPUS = [
+    ("play todays hits", "Today's Hits "),
+    ("play beyonce", "Beyoncé "),
+    ("play kendrik lamarr", "Kendrick Lamar "),
+    ("play chillhop", "Chill Hop "),
+    ("play yo yo ma", "Yo-Yo Ma "),
+    ("play chaikovsky", "Tchaikovsky "),
+    ("play classic rok on pandora", "Classic Rock "),
+    ("play metalica", "Metallica "),
+    ("play nervana radio", "Nirvana "),
+    ("play low fi beats", "Lo-Fi Beats "),
+    ("play fish", "Phish "),
+    ("play ed shearan", "Ed Sheeran "),
+    ("play thelonius monk", "Thelonious Monk "),
+    ("play hosier", "Hozier "),
+    ("change station to imagine dragon", "Imagine Dragons "),
+]
+NO_MATCH = ["play something else", "play the news"]
+
+
+def baseline_extract_station(utterance, stations):
+    """ _extract_station as it was before the station index """
+    for vocab in VOCABS:
+        utterance = utterance.replace(vocab, "")
+    for words in [" to ", " on ", " pandora", " play"]:
+        utterance = utterance.replace(words, "")
+    probabilities = fuzz_process.extractOne(
+        utterance, [station[0] for station in stations], scorer=fuzz.ratio)
+    if probabilities[1] > 70:
+        return probabilities[0]
+    return None
+
+
+def make_index(skill_module, scorer):
+    index = skill_module.StationIndex(
+        VOCABS + COMMON_WORDS, scorer=skill_module.pick_scorer(scorer))
+    index.update([(name, number) for number, name in enumerate(STATIONS)])
+    return index
+
+
+def random_stations(count):
+    rng = random.Random(count)
+    words = ("rock jazz hits today's classic country blues indie pop folk "
+             "chill dance soul metal punk").split()
+    return [(" ".join(rng.sample(words, 2)) + " " + str(number) + " ",
+             number) for number in range(count)]
+
+
+def accuracy(match):
+    return sum(1 for utterance, wanted in CORPUS
+               if match(utterance) == wanted) / float(len(CORPUS))
+
+
+@pytest.mark.parametrize("scorer", ["fuzzywuzzy", "rapidfuzz"])
+def test_accuracy_on_mistranscribed_names(skill_module, scorer):
+    if scorer == "rapidfuzz" and not skill_module.rapidfuzz_fuzz:
+        pytest.skip("rapidfuzz isn't installed")
+    index = make_index(skill_module, scorer)
+
+    def match(utterance):
+        return (index.match(utterance) or [None])[0]
+
+    stations = [(name, number) for number, name in enumerate(STATIONS)]
+    baseline = accuracy(
+        lambda utterance: baseline_extract_station(utterance, stations))
+    ours = accuracy(match)
+    print("{}: {:.0%} of the corpus, before the index {:.0%}".format(
+        scorer, ours, baseline))
+    assert ours >= baseline
+    assert ours >= 0.9
+    for utterance in NO_MATCH:
+        assert match(utterance) is None, utterance
+
+
+def test_pick_scorer_falls_back(skill_module):
+    assert skill_module.pick_scorer("fuzzywuzzy").name == "fuzzywuzzy"
+    assert skill_module.pick_scorer("no-such-scorer") is not None
+
+
+def test_repeated_utterances_come_from_the_cache(skill_module):
+    index = make_index(skill_module, "fuzzywuzzy")
+    calls = []
+    score_all = index.scorer.score_all
+
+    def counting(*args):
+        calls.append(args)
+        return score_all(*args)
+    index.scorer.score_all = counting
+    first = index.match("play metalica")
+    scored = len(calls)
+    assert index.match("play metalica") == first
+    assert len(calls) == scored
+
+
+@pytest.mark.parametrize("count", [10, 100, 1000])
+def test_benchmark_baseline_extract_station(benchmark, count):
+    stations = random_stations(count)
+    utterances = ["play {}on pandora".format(stations[n][0])
+                  for n in range(0, count, max(count // 10, 1))]
+    benchmark.group = "extract station, {} stations".format(count)
+    benchmark(lambda: [baseline_extract_station(utterance, stations)
+                       for utterance in utterances])
+
+
+@pytest.mark.parametrize("scorer", ["fuzzywuzzy", "rapidfuzz"])
+@pytest.mark.parametrize("count", [10, 100, 1000])
+def test_benchmark_station_index(benchmark, skill_module, tmp_path, count,
+                                 scorer):
+    if scorer == "rapidfuzz" and not skill_module.rapidfuzz_fuzz:
+        pytest.skip("rapidfuzz isn't installed")
+    stations = random_stations(count)
+    utterances = ["play {}on pandora".format(stations[n][0])
+                  for n in range(0, count, max(count // 10, 1))]
+    index = skill_module.StationIndex(VOCABS + COMMON_WORDS,
+                                      scorer=skill_module.pick_scorer(scorer))
+    index.update(stations)
+    # With listening history for every station, as on a well used device
+    history = skill_module.PlayHistory(str(tmp_path / "history.log"))
+    for name, number in stations:
+        for hour in range(24):
+            history._add(name, hour, number + hour)
+    index.prior = history.prior
+
+    def match_all():
+        index.clear_cache()  # measure matching, not the cache
+        return [index.match(utterance) for utterance in utterances]
+    benchmark.group = "extract station, {} stations".format(count)
+    results = benchmark(match_all)
+    assert all(results)
+
+
+def test_history_breaks_ties(skill_module, tmp_path):
+    history = skill_module.PlayHistory(str(tmp_path / "history.log"))
+    index = skill_module.StationIndex(VOCABS + COMMON_WORDS)
+    index.update([("Jazz Classics ", 0), ("Jazz Classic ", 1)])
+    index.prior = history.prior
+    for _ in range(5):
+        history.record("Jazz Classics ", 200)
+    index.clear_cache()
+    assert index.match("play jazz classic")[0] == "Jazz Classics "
@@ -0,0 +1,56 @@
+import pytest
+
+
+@pytest.fixture
+def listing(skill_module, home):
+    skill = skill_module.create_skill()
+
+    def with_stations(count, page_size=10):
+        skill.settings["stations"] = [["s" + str(n), n]
+                                      for n in range(count)]
+        skill.settings["list_page_size"] = page_size
+        del skill.spoken[:]
+        return skill
+    yield with_stations
+    skill.shutdown()
+
+
+def test_short_list_is_one_sentence(listing):
+    skill = listing(6)
+    skill.handle_list()
+    assert skill.spoken == [skill.translate(
+        "subscribed.to.stations", {"stations": "s0, s1, s2, s3, s4 and s5"})]
+
+
+def test_one_leftover_station_joins_the_last_page(listing):
+    skill = listing(11)
+    skill.handle_list()
+    assert len(skill.spoken) == 2
+    assert skill.spoken[-1] == "s5, s6, s7, s8, s9 and s10"
+
+
+def test_further_pages_are_offered(listing):
+    skill = listing(16)
+    skill.responses = ["yes"]
+    skill.handle_list()
+    assert skill.spoken[2] == skill.translate("more.stations",
+                                              {"count": 6})
+    assert skill.spoken[-1] == "s10, s11, s12, s13, s14 and s15"
+
+
+def test_declining_stops_the_list(listing):
+    skill = listing(30)
+    skill.responses = ["no thanks"]
+    skill.handle_list()
+    assert skill.spoken[-1] == skill.translate("more.stations",
+                                               {"count": 20})
+
+
+def test_never_one_station_on_its_own(listing):
+    for count in range(2, 26):
+        for page_size in range(1, 11):
+            skill = listing(count, page_size)
+            skill.responses = ["yes"] * count
+            skill.handle_list()
+            assert "There are 1 more stations" not in " ".join(skill.spoken)
+            assert not skill.spoken[-1].startswith("and ")